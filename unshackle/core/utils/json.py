@@ -0,0 +1,6 @@
+try:
+    from orjson import loads as json_loads
+except ImportError:  # orjson is optional, fall back to the stdlib parser
+    from json import loads as json_loads
+
+__all__ = ("json_loads",)
@@ -4,7 +4,6 @@ import re
 from collections.abc import Generator
 from datetime import timedelta
 from typing import Any, Union
-from urllib.parse import urlparse
 
 import click
 from click import Context
@@ -14,6 +13,13 @@ from unshackle.core.search_result import SearchResult
 from unshackle.core.service import Service
 from unshackle.core.titles import Episode, Movie, Movies, Series
 from unshackle.core.tracks import Chapter, Chapters, Tracks
+from unshackle.core.utils.json import json_loads
+from unshackle.core.utils.xml import load_xml
+
+SERIES_RE = re.compile(r"Series \d+")
+# load_xml strips namespaces, so the compiled expression can stay unqualified
+ROLE_VALUE_XPATH = etree.XPath("Role/@value")
+DESCRIPTIVE_ROLES = frozenset({"description", "alternative", "alternate"})
 
 
 class STV(Service):
@@ -61,7 +67,7 @@ class STV(Service):
         }
         r = self.session.post(self.config["endpoints"]["search"], data=data)
         r.raise_for_status()
-        results = r.json()["records"]["page"]
+        results = json_loads(r.content)["records"]["page"]
 
         for result in results:
             label = result.get("category")
@@ -83,7 +89,7 @@ class STV(Service):
         if kind == "episode":
             r = self.session.get(self.base + f"episodes/{slug}")
             r.raise_for_status()
-            episode = r.json()["results"]
+            episode = json_loads(r.content)["results"]
 
             if episode.get("genre").lower() == "movie":
                 return Movies(
@@ -104,8 +110,8 @@ class STV(Service):
                     id_=episode["video"].get("id"),
                     service=self.__class__,
                     title=episode["programme"].get("name"),
-                    season=int(episode["playerSeries"]["name"].split(" ")[1])
-                    if episode.get("playerSeries") and re.match(r"Series \d+", episode["playerSeries"]["name"])
+                    season=int(series_name.split(" ")[1])
+                    if (series_name := (episode.get("playerSeries") or {}).get("name")) and SERIES_RE.match(series_name)
                     else 0,
                     number=int(episode.get("number", 0)),
                     name=episode.get("title", "").lstrip("0123456789. ").lstrip(),
@@ -117,19 +123,18 @@ class STV(Service):
         elif kind == "summary":
             r = self.session.get(self.base + f"programmes/{slug}")
             r.raise_for_status()
-            data = r.json()
+            data = json_loads(r.content)
 
             series = [series.get("guid") for series in data["results"]["series"]]
-            seasons = [self.session.get(self.base + f"episodes?series.guid={i}").json() for i in series]
+            seasons = [json_loads(self.session.get(self.base + f"episodes?series.guid={i}").content) for i in series]
 
             episodes = [
                 Episode(
                     id_=episode["video"].get("id"),
                     service=self.__class__,
                     title=data["results"].get("name"),
-                    season=int(episode["playerSeries"]["name"].split(" ")[1])
-                    if episode.get("playerSeries")
-                    and re.match(r"Series \d+", episode["playerSeries"]["name"])
+                    season=int(series_name.split(" ")[1])
+                    if (series_name := (episode.get("playerSeries") or {}).get("name")) and SERIES_RE.match(series_name)
                     else 0,
                     number=int(episode.get("number", 0)),
                     name=episode.get("title", "").lstrip("0123456789. ").lstrip(),
@@ -154,7 +159,7 @@ class STV(Service):
         )
         if not r.ok:
             raise ConnectionError(r.text)
-        data = r.json()
+        data = json_loads(r.content)
 
         source_manifest = next(
             (source["src"] for source in data["sources"] if source.get("type") == "application/dash+xml"),
@@ -173,12 +178,17 @@ class STV(Service):
 
             self.license = key_systems["key_systems"]["com.widevine.alpha"]["license_url"] if key_systems else None
 
-        manifest = self.trim_duration(source_manifest)
-        tracks = DASH.from_text(manifest, source_manifest).to_tracks(title.language)
+        r = self.session.get(source_manifest)
+        if not r.ok:
+            raise ConnectionError(r.text)
+
+        manifest = load_xml(r.content)
+        self.trim_duration(manifest)
+        tracks = DASH(manifest, r.url).to_tracks(title.language)
 
         for track in tracks.audio:
-            role = track.data["dash"]["representation"].find("Role")
-            if role is not None and role.get("value") in ["description", "alternative", "alternate"]:
+            roles = ROLE_VALUE_XPATH(track.data["dash"]["representation"])
+            if roles and roles[0] in DESCRIPTIVE_ROLES:
                 track.descriptive = True
 
         return tracks
@@ -206,27 +216,30 @@ class STV(Service):
 
     @staticmethod
     def parse_title(title: str) -> tuple[str, str]:
-        parsed_url = urlparse(title).path.split("/")
-        kind, slug = parsed_url[1], parsed_url[2]
-        if kind not in ["episode", "summary"]:
+        # e.g. https://player.stv.tv/episode/2ro8/rebus -> ["player.stv.tv", "episode", "2ro8", "rebus"]
+        path = title.partition("#")[0].partition("?")[0]
+        parts = (path.partition("://")[2] or path).split("/", 3)
+        if len(parts) < 3 or parts[1] not in ("episode", "summary"):
             raise ValueError("Failed to parse title - is the URL correct?")
 
-        return kind, slug
+        return parts[1], parts[2]
 
     @staticmethod
-    def trim_duration(source_manifest: str) -> str:
+    def trim_duration(manifest: etree.Element) -> None:
         """
         The last segment on all tracks return a 404 for some reason, causing a failed download.
         So we trim the duration by exactly one segment to account for that.
 
+        The MPD element is patched in place so the manifest is fetched and parsed only once.
+
         TODO: Calculate the segment duration instead of assuming length.
         """
-        manifest = DASH.from_url(source_manifest).manifest
         period_duration = manifest.get("mediaPresentationDuration")
+        if not period_duration:
+            return
+
         period_duration = DASH.pt_to_sec(period_duration)
 
         hours, minutes, seconds = str(timedelta(seconds=period_duration - 6)).split(":")
         new_duration = f"PT{hours}H{minutes}M{seconds}S"
         manifest.set("mediaPresentationDuration", new_duration)
-
-        return etree.tostring(manifest, encoding="unicode")
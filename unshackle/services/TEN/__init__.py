@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 import base64
-import concurrent.futures
 import hashlib
 import hmac
 import json
@@ -10,16 +9,19 @@ import sys
 import time
 import uuid
 from collections.abc import Generator
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone
+from functools import lru_cache
 from http.cookiejar import MozillaCookieJar
 from typing import Any, Optional, Union
+from urllib.parse import urljoin
 
 import click
 import m3u8
 from click import Context
 from langcodes import Language
 from requests import Request
+from requests.adapters import HTTPAdapter
 from unshackle.core.config import config
 from unshackle.core.credential import Credential
 from unshackle.core.downloaders import requests
@@ -28,6 +30,32 @@ from unshackle.core.search_result import SearchResult
 from unshackle.core.service import Service
 from unshackle.core.titles import Episode, Movie, Movies, Series
 from unshackle.core.tracks import Chapter, Chapters, Subtitle, Tracks, Video
+from unshackle.core.utils.json import json_loads
+
+AD_LINE_RE = re.compile(r"^.*redirector\.googlevideo\.com.*(?:\r?\n|$)", re.M)
+SHOW_PAGE_DATA_RE = re.compile(rb"const showPageData = ({.*?});", re.DOTALL)
+SANITIZE_STEPS = (
+    (re.compile(r"[:;/()]"), ""),
+    (re.compile(r"[ ]"), "-"),
+    (re.compile(r"[\\*!?¿,'\"<>|$#`’]"), ""),
+    (re.compile(r"[.]{2,}"), "."),
+    (re.compile(r"[_]{2,}"), "_"),
+    (re.compile(r"[-]{2,}"), "-"),
+    (re.compile(r"[ ]{2,}"), " "),
+)
+
+
+@lru_cache(maxsize=256)
+def _sign(api_key: bytes, timestamp: int, url: str) -> str:
+    """X-N10-SIG value, memoized so bursts of requests within the same second skip the HMAC."""
+    signature = hmac.new(api_key, f"{timestamp}:{url}".encode("utf-8"), hashlib.sha256).hexdigest()
+    return f"{timestamp}_{signature}"
+
+
+@lru_cache(maxsize=1)
+def _encode_timestamp(timestamp_str: str) -> str:
+    """X-Network-Ten-Auth value, which only changes once per second."""
+    return base64.b64encode(timestamp_str.encode("utf-8")).decode("ascii")
 
 
 class TEN(Service):
@@ -65,6 +93,19 @@ class TEN(Service):
         "tenplay",
     )
 
+    # manifest bitrate label for each source height, and the higher qualities the CDN can serve
+    SOURCE_BITRATES = {
+        1080: "5000000",
+        720: "3000000",
+        540: "1500000",
+        360: "750000",
+    }
+    QUALITIES = (
+        {"quality": "540p", "bitrate": 1500000, "height": 540, "width": 960},
+        {"quality": "720p", "bitrate": 3000000, "height": 720, "width": 1280},
+        {"quality": "1080p", "bitrate": 5000000, "height": 1080, "width": 1920},
+    )
+
     @staticmethod
     @click.command(name="TEN", short_help="https://10.com.au/", help=__doc__)
     @click.argument("title", type=str)
@@ -76,10 +117,37 @@ class TEN(Service):
         self.title = title
         super().__init__(ctx)
 
+        self.api_key = bytes.fromhex(self.config["api_key"])
+        self._playback_cache: dict[str, tuple[Optional[str], dict]] = {}
+        self._stream_cache: dict[str, dict] = {}
+        self._chapters_futures: dict[str, Future] = {}
+
         if config.downloader != "n_m3u8dl_re":
             self.log.error(" - Error: n_m3u8dl_re downloader is required for this service.")
             sys.exit(1)
 
+        # quality probes fan out playlist GETs and segment HEADs to the same hosts concurrently
+        adapter = HTTPAdapter(
+            pool_connections=16,
+            pool_maxsize=16,
+            max_retries=self.session.adapters["https://"].max_retries,
+            pool_block=True,
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        # shared by the season and quality fan-outs so threads stay warm across calls
+        self._pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="TEN")
+        # segment HEAD probes are waited on from inside _pool tasks, so they need their own workers
+        # or a saturated _pool could deadlock on its own queue
+        self._probe_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="TEN-probe")
+
+    def __del__(self) -> None:
+        for name in ("_pool", "_probe_pool"):
+            pool = getattr(self, name, None)
+            if pool is not None:
+                pool.shutdown(wait=False)
+
     def search(self) -> Generator[SearchResult, None, None]:
         query = self.endpoints["searchApiEndpoint"] + self.title
 
@@ -105,9 +173,16 @@ class TEN(Service):
             raise EnvironmentError("Service requires Credentials for Authentication.")
 
         self.session.headers.update(self.config["headers"])
-        self.endpoints = self._request(
-            "GET", self.config["endpoints"]["config"], params={"SystemName": "tvos"}
-        )
+        self.session.headers.update({"tp-acceptfeature": "v1/fw;v1/drm;v2/live", "tp-platform": "UAP"})
+
+        endpoints = self.cache.get("endpoints_tvos")
+        if endpoints and not endpoints.expired:
+            self.endpoints = endpoints.data
+        else:
+            self.endpoints = self._request(
+                "GET", self.config["endpoints"]["config"], params={"SystemName": "tvos"}
+            )
+            endpoints.set(self.endpoints, expiration=86400)
 
         cache = self.cache.get(f"tokens_{credential.sha1}")
 
@@ -245,28 +320,33 @@ class TEN(Service):
             "appVersion": "v1",
         }
 
-        r = self.session.get(playback_url, params=params)
-        if not r.ok:
-            raise ValueError("Failed to get playback data: " + r.text)
-        
-        
-        dai_auth = r.headers.get("X-DAI-AUTH")
-        video_id = r.headers.get("x-dai-video-id")
-        if dai_auth is not None:
-            payload = {"auth-token": dai_auth}
-        
-        playback_data = r.json()
+        if playback_url not in self._playback_cache:
+            r = self.session.get(playback_url, params=params)
+            if not r.ok:
+                raise ValueError("Failed to get playback data: " + r.text)
+
+            self._playback_cache[playback_url] = (r.headers.get("X-DAI-AUTH"), json_loads(r.content))
+
+        dai_auth, playback_data = self._playback_cache[playback_url]
+        payload = {"auth-token": dai_auth} if dai_auth is not None else None
 
         video_id = playback_data.get("dai", {}).get("videoId")
         source_id = playback_data.get("dai", {}).get("contentSourceId", "2690006")
         if not video_id or not source_id:
-            raise ValueError("Failed to get video ID: " + r.text)
-        
+            raise ValueError(f"Failed to get video ID: {playback_data}")
+
         dai_stream = f"https://dai.google.com/ondemand/v1/hls/content/{source_id}/vid/{video_id}/stream"
 
-        stream_data = self._request("POST", dai_stream, data=payload)
+        if dai_stream not in self._stream_cache:
+            self._stream_cache[dai_stream] = self._request("POST", dai_stream, data=payload)
+        stream_data = self._stream_cache[dai_stream]
 
         title.data["chapters"] = stream_data.get("time_events_url")
+        if title.data["chapters"] and title.data["chapters"] not in self._chapters_futures:
+            # fetch the ad break events while the quality probes run, get_chapters picks them up later
+            self._chapters_futures[title.data["chapters"]] = self._pool.submit(
+                self._request, "GET", title.data["chapters"]
+            )
         # program_language = Language.find(stream_data["customFields"].get("program_language", "en"))
 
         manifest_url = stream_data.get("stream_manifest")
@@ -297,7 +377,8 @@ class TEN(Service):
         if not title.data.get("chapters"):
             return Chapters()
         
-        events = self._request("GET", title.data["chapters"])
+        future = self._chapters_futures.pop(title.data["chapters"], None)
+        events = future.result() if future else self._request("GET", title.data["chapters"])
         cue_points = events.get("cuepoints")
         if not cue_points:
             return Chapters()
@@ -313,7 +394,7 @@ class TEN(Service):
 
     def _head_request(self, url: str) -> int:
         try:
-            return self.session.head(url, timeout=10).status_code
+            return self.session.head(url, timeout=3).status_code
         except Exception:
             return 0
 
@@ -321,29 +402,31 @@ class TEN(Service):
         self, best_track: Video, quality_info: dict, source_bitrate: int
     ) -> Video | None:
         playlist_uri = best_track.data["hls"]["playlist"].uri
-        playlist_text = self.session.get(playlist_uri).text
-
         string_to_replace = f"-{source_bitrate}"
         replacement_string = f"-{quality_info['bitrate']}"
-        
-        lines = []
-        for line in playlist_text.splitlines():
-            if "redirector.googlevideo.com" in line:
-                continue
-            
-            if string_to_replace in line:
-                line = line.replace(string_to_replace, replacement_string)
-            
-            lines.append(line)
-
-        modified_playlist_text = "\n".join(lines)
-        playlist_obj = m3u8.loads(modified_playlist_text)
 
-        if not playlist_obj.segments:
-            return None
+        # probe the first segment while the rest of the playlist is still downloading
+        with self.session.get(playlist_uri, stream=True) as r:
+            if r.encoding is None:
+                r.encoding = "utf-8"
+
+            probe = None
+            lines = []
+            for line in r.iter_lines(decode_unicode=True):
+                lines.append(line)
+                if probe is None and line and not line.startswith("#") and "redirector.googlevideo.com" not in line:
+                    segment_url = urljoin(playlist_uri, line.replace(string_to_replace, replacement_string))
+                    probe = self._probe_pool.submit(self._head_request, segment_url)
+                elif probe is not None and probe.done() and probe.result() != 200:
+                    return None
+
+            if probe is None or probe.result() != 200:
+                return None
+
+        modified_playlist_text = AD_LINE_RE.sub("", "\n".join(lines)).replace(string_to_replace, replacement_string)
+        playlist_obj = m3u8.loads(modified_playlist_text)
 
-        first_segment = playlist_obj.segments[0].uri
-        if self._head_request(first_segment) == 200:
+        if playlist_obj.segments:
             playlist_file = config.directories.cache / "TEN" / f"playlist_{quality_info['quality']}.m3u8"
             playlist_obj.dump(playlist_file)
 
@@ -369,38 +452,24 @@ class TEN(Service):
             return tracks
 
         best_track = max(tracks.videos, key=lambda t: t.height or 0)
+        height = best_track.height or 0
 
-        source_bitrate = {
-            1080: "5000000",
-            720: "3000000",
-            540: "1500000",
-            360: "750000",
-        }.get(best_track.height)
-
-        all_qualities = [
-            {"quality": "540p", "bitrate": 1500000, "height": 540, "width": 960},
-            {"quality": "720p", "bitrate": 3000000, "height": 720, "width": 1280},
-            {"quality": "1080p", "bitrate": 5000000, "height": 1080, "width": 1920},
-        ]
-
-        qualities_to_check = [
-            q for q in all_qualities if q["height"] > best_track.height
-        ]
+        source_bitrate = self.SOURCE_BITRATES.get(height)
+        qualities_to_check = tuple(q for q in self.QUALITIES if q["height"] > height)
 
         if not qualities_to_check:
             return tracks
 
-        with ThreadPoolExecutor(max_workers=len(qualities_to_check)) as executor:
-            future_to_track = {
-                executor.submit(self._check_and_add_track, best_track, quality, source_bitrate): quality
-                for quality in qualities_to_check
-            }
-            
-            for future in concurrent.futures.as_completed(future_to_track):
-                new_track = future.result()
-                if new_track:
-                    tracks.add(new_track)
-        
+        future_to_track = {
+            self._pool.submit(self._check_and_add_track, best_track, quality, source_bitrate): quality
+            for quality in qualities_to_check
+        }
+
+        for future in as_completed(future_to_track):
+            new_track = future.result()
+            if new_track:
+                tracks.add(new_track)
+
         return tracks
 
 
@@ -428,27 +497,21 @@ class TEN(Service):
         if not seasons:
             raise ValueError("Could not find a season list for this title")
 
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            results = list(executor.map(self._fetch_episode, seasons))
-
-        titles = []
-        for result in results:
-            for episode in result:
-                ep_number = episode.get("episode")
-                sea_number = episode.get("season")
-                titles.append(
-                    Episode(
-                        id_=episode.get("id"),
-                        service=self.__class__,
-                        name=episode.get("vodTitle", "").split(" - ")[-1],
-                        season=int(sea_number) if sea_number and sea_number.isdigit() else 0,
-                        number=int(ep_number) if ep_number and ep_number.isdigit() else 0,
-                        title=episode.get("tvShow"),
-                        data=episode,
-                    )
-                )
+        results = list(self._pool.map(self._fetch_episode, seasons))
 
-        return titles
+        return [
+            Episode(
+                id_=episode.get("id"),
+                service=self.__class__,
+                name=episode.get("vodTitle", "").split(" - ")[-1],
+                season=int(sea_number) if (sea_number := episode.get("season")) and sea_number.isdigit() else 0,
+                number=int(ep_number) if (ep_number := episode.get("episode")) and ep_number.isdigit() else 0,
+                title=episode.get("tvShow"),
+                data=episode,
+            )
+            for result in results
+            for episode in result
+        ]
 
     def _movie(self, data: dict) -> Movie:
         endpoint = next(
@@ -492,10 +555,16 @@ class TEN(Service):
         ]
 
     def _get_html(self, url: str) -> Optional[str]:
-        page = self.session.get(url).text
-        pattern = re.compile(r"const showPageData = ({.*?});", re.DOTALL)
+        # stop downloading as soon as the page data blob has been received
+        match = None
+        page = bytearray()
+        with self.session.get(url, stream=True) as r:
+            for chunk in r.iter_content(chunk_size=65536):
+                page += chunk
+                match = SHOW_PAGE_DATA_RE.search(page)
+                if match:
+                    break
 
-        match = pattern.search(page)
         if not match:
             raise ValueError(
                 " - Failed to parse HTML. Page Data not found in the source code."
@@ -504,7 +573,7 @@ class TEN(Service):
         page_data = match.group(1)
 
         try:
-            data = json.loads(page_data)
+            data = json_loads(page_data)
         except json.JSONDecodeError as e:
             raise json.JSONDecodeError(f"Failed to parse JSON: {e}")
 
@@ -515,38 +584,29 @@ class TEN(Service):
         return show_id
 
     def _signature_header(self, url: str) -> str:
-        timestamp = int(time.time())
-        message = f"{timestamp}:{url}".encode("utf-8")
-        api_key = bytes.fromhex(self.config["api_key"])
-        signature = hmac.new(api_key, message, hashlib.sha256).hexdigest()
-        return f"{timestamp}_{signature}"
+        return _sign(self.api_key, int(time.time()), url)
 
     def _auth_header(self) -> str:
         now_utc = datetime.now(timezone.utc)
-        timestamp_str = now_utc.strftime("%Y%m%d%H%M%S")
-        encoded_bytes = base64.b64encode(timestamp_str.encode("utf-8"))
-        return encoded_bytes.decode("ascii")
+        return _encode_timestamp(now_utc.strftime("%Y%m%d%H%M%S"))
 
     def _request(self, method: str, url: str, **kwargs: Any) -> Any[dict | str]:
+        # signed per request rather than on the shared session, as chapters are fetched from another thread
+        headers = {}
         if method == "GET":
-            self.session.headers.update(
-                {
-                    "X-N10-SIG": self._signature_header(url),
-                    "tp-acceptfeature": "v1/fw;v1/drm;v2/live",
-                    "tp-platform": "UAP",
-                }
-            )
+            headers["X-N10-SIG"] = self._signature_header(url)
         elif method == "POST":
-            self.session.headers.update({"X-Network-Ten-Auth": self._auth_header()})
+            headers["X-Network-Ten-Auth"] = self._auth_header()
+        headers.update(kwargs.pop("headers", None) or {})
 
-        prep = self.session.prepare_request(Request(method, url, **kwargs))
+        prep = self.session.prepare_request(Request(method, url, headers=headers, **kwargs))
 
         response = self.session.send(prep)
         if response.status_code not in (200, 201):
             raise ConnectionError(f"{response.text}")
 
         try:
-            return json.loads(response.content)
+            return json_loads(response.content)
 
         except json.JSONDecodeError:
             return True if "true" in response.text else False
@@ -555,11 +615,6 @@ class TEN(Service):
     def _sanitize(title: str) -> str:
         title = title.lower()
         title = title.replace("&", "and")
-        title = re.sub(r"[:;/()]", "", title)
-        title = re.sub(r"[ ]", "-", title)
-        title = re.sub(r"[\\*!?¿,'\"<>|$#`’]", "", title)
-        title = re.sub(rf"[{'.'}]{{2,}}", ".", title)
-        title = re.sub(rf"[{'_'}]{{2,}}", "_", title)
-        title = re.sub(rf"[{'-'}]{{2,}}", "-", title)
-        title = re.sub(rf"[{' '}]{{2,}}", " ", title)
+        for pattern, replacement in SANITIZE_STEPS:
+            title = pattern.sub(replacement, title)
         return title
@@ -3,7 +3,9 @@ from __future__ import annotations
 import json
 import re
 from collections.abc import Generator
+from concurrent.futures import ThreadPoolExecutor
 from http.cookiejar import MozillaCookieJar
+from types import MappingProxyType
 from typing import Any, Optional, Union
 import click
 from click import Context
@@ -13,23 +15,43 @@ from unshackle.core.search_result import SearchResult
 from unshackle.core.service import Service
 from unshackle.core.titles import Episode, Movie, Movies, Series
 from unshackle.core.tracks import Chapters, Subtitle, Tracks
+from unshackle.core.utils.json import json_loads
 import requests
 
-def get_widevine_license_url(manifest_str):
-    # Try JSON first
-    try:
-        data = json.loads(manifest_str)
-        for source in data.get("sources", []):
-            widevine = source.get("key_systems", {}).get("com.wiunshackle.alpha")
-            if widevine and "license_url" in widevine:
-                return widevine["license_url"]
-    except json.JSONDecodeError:
-        pass
+LICENSE_RE = re.compile(rb'bc:licenseAcquisitionUrl="([^"]+)"')
+
+# browser headers shared by every suggestedtv.com and Brightcove call, set once on the session
+BASE_HEADERS = MappingProxyType({
+    'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64; rv:138.0) Gecko/20100101 Firefox/138.0',
+    'Accept': '*/*',
+    'Accept-Language': 'en-GB,en;q=0.5',
+    'Referer': 'https://tptvencore.co.uk/',
+    'tenant': 'encore',
+    'Origin': 'https://tptvencore.co.uk',
+    'DNT': '1',
+    'Connection': 'keep-alive',
+    'Sec-Fetch-Dest': 'empty',
+    'Sec-Fetch-Mode': 'cors',
+    'Sec-Fetch-Site': 'cross-site',
+    'Priority': 'u=4',
+})
+BRIGHTCOVE_HEADERS = MappingProxyType({
+    **{k: v for k, v in BASE_HEADERS.items() if k != 'tenant'},
+    'BCOV-Policy': 'BCpkADawqM1yq3Go9abHJ4lBZ0wrYStC-pS1W01hdlACHxsiIz9AvQXy1wa3iqyd6yVJLXLZnZjFkKI2BCJjbtxiJqyPMZjIezEWKrI1TTSbugkD6dAXs7Ucxq09P9zQ8ZRU4ZjTa83VFhiL',
+})
+
+
+def get_widevine_license_url(data: dict, manifest: bytes):
+    # Playback JSON that the caller has already decoded
+    for source in data.get("sources", []):
+        widevine = (source.get("key_systems") or {}).get("com.widevine.alpha")
+        if widevine and "license_url" in widevine:
+            return widevine["license_url"]
 
     # Fallback for XML style
-    match = re.search(r'bc:licenseAcquisitionUrl="([^"]+)"', manifest_str)
+    match = LICENSE_RE.search(manifest)
     if match:
-        return match.group(1)
+        return match.group(1).decode()
 
     return None
 
@@ -89,6 +111,10 @@ class TPTV(Service):
             self.profile = "default"
         self.session = requests.session()
         self.session.headers.update(self.config["headers"])
+        self.session.headers.update(BASE_HEADERS)
+        # kept apart from self.session so the suggestedtv session/tenant headers don't leak to Brightcove
+        self.bcov_session = requests.session()
+        self.bcov_session.headers.update(BRIGHTCOVE_HEADERS)
 
     def authenticate(self, cookies: Optional[MozillaCookieJar] = None, credential: Optional[Credential] = None) -> None:
         super().authenticate(cookies, credential)
@@ -96,32 +122,16 @@ class TPTV(Service):
             raise EnvironmentError("Service requires Credentials for Authentication.")
 
         cache = self.cache.get(f"tokens_{credential.sha1}")
-        # first contact
-        fc_headers = {
-            'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64; rv:138.0) Gecko/20100101 Firefox/138.0',
-            'Accept': '*/*',
-            'Accept-Language': 'en-GB,en;q=0.5',
-            'api-key': 'zq5pyPd0RTbNg3Fyj52PrkKL9c2Af38HHh4itgZTKDaCzjAyhd',
-            'Referer': 'https://tptvencore.co.uk/',
-            'tenant': 'encore',
-            'Content-Type': 'application/json',
-            'Origin': 'https://tptvencore.co.uk',
-            'DNT': '1',
-            'Connection': 'keep-alive',
-            'Sec-Fetch-Dest': 'empty',
-            'Sec-Fetch-Mode': 'cors',
-            'Sec-Fetch-Site': 'cross-site',
-            'Priority': 'u=0',
-
-            }
-        payload = {}
-        r = self.session.post(self.config["endpoints"]["session"], headers=fc_headers, json=payload)
-        if r.status_code != 200:
-            raise ConnectionError   
+        # first contact, reused across runs and renewed by renew_session() if the API rejects it
+        self.session_cache = self.cache.get(f"session_{credential.sha1}")
+        if self.session_cache and not self.session_cache.expired:
+            self.session.headers.update({'session': self.session_cache.data})
         else:
-            session_id = r.json()['id']
-            self.session.headers.update({'session': session_id})
-        
+            self.new_session()
+        # authenticate may run more than once, a second hook would renew and resend twice per 401
+        if self.renew_session not in self.session.hooks["response"]:
+            self.session.hooks["response"].append(self.renew_session)
+
         # login
         if cache and not cache.expired:
             # cached
@@ -129,11 +139,9 @@ class TPTV(Service):
             tokens = cache.data
         else:
             self.log.info(" + Logging in...")
-            payload = {"email": credential.username, "password": credential.password}
             
             r = self.session.post(
                 self.config["endpoints"]["login"],
-                headers=self.session.headers,
                 json={
                     "email": credential.username,
                     "password": credential.password,
@@ -154,48 +162,30 @@ class TPTV(Service):
     def search(self) -> Generator[SearchResult, None, None]:
         query = self.title.replace(" ", "+")
         search_url = self.config["endpoints"]["search"].replace("{query}", query)
-        session_id = self.session.headers['session']
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64; rv:138.0) Gecko/20100101 Firefox/138.0',
-            'Accept': '*/*',
-            'Accept-Language': 'en-GB,en;q=0.5',
-            'Referer': 'https://tptvencore.co.uk/',
-            'session': session_id,
-            'tenant': 'encore',
-            'Origin': 'https://tptvencore.co.uk',
-            'DNT': '1',
-            'Connection': 'keep-alive',
-            'Sec-Fetch-Dest': 'empty',
-            'Sec-Fetch-Mode': 'cors',
-            'Sec-Fetch-Site': 'cross-site',
-            'Priority': 'u=4',
-        }
-        r = self.session.get(search_url, headers=headers)
+        r = self.session.get(search_url)
         if r.status_code != 200:
             raise ConnectionError(f"Search failed with {r.status_code}: {r.text}")     
 
         results = r.json()["data"]
         myitems = [] 
         if isinstance(results, list):
-            for result in results:
-                # do lookup on list item product or collection    
-                if  result.startswith('collection_'):
-                    id = result.replace('collection_','')
-                    collection_url = f"https://prod.suggestedtv.com/api/client/v1/collection/by-reference/{id}?extend=label"
-                    response = self.session.get(collection_url, headers=headers)
-                    if response.status_code == 200:
-                        data = response.json()
-                        for item in data['children']:        
-                            myitems.append(item['id'].replace('product_',''))
+            # look up every collection concurrently, then merge in the original result order
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                collections = {
+                    result: executor.submit(self.get_collection_items, result.replace('collection_',''))
+                    for result in results
+                    if result.startswith('collection_')
+                }
+                for result in results:
+                    if result in collections:
+                        myitems.extend(collections[result].result())
                     else:
-                        print(f"Error: {response.status_code} - {response.text}")
-                else:
-                    myitems.append(result.replace('product_',''))
-                    mystring = ",".join(myitems)
-                
+                        myitems.append(result.replace('product_',''))
+
+            mystring = ",".join(myitems)
             continued_search_url = "https://prod.suggestedtv.com/api/client/v1/product?ids=" + mystring + "&extend=label"
             
-            response = self.session.get(continued_search_url, headers=headers)
+            response = self.session.get(continued_search_url)
             response.raise_for_status
             results = response.json()
             if isinstance(results, list):
@@ -221,30 +211,14 @@ class TPTV(Service):
         data = self.get_data(self.title)
         ids = ",".join(data)
 
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64; rv:138.0) Gecko/20100101 Firefox/138.0',
-            'Accept': '*/*',
-            'Accept-Language': 'en-GB,en;q=0.5',
-            'Referer': 'https://tptvencore.co.uk/',
-            'tenant': 'encore',
-            'Origin': 'https://tptvencore.co.uk',
-            'DNT': '1',
-            'Connection': 'keep-alive',
-            'Sec-Fetch-Dest': 'empty',
-            'Sec-Fetch-Mode': 'cors',
-            'Sec-Fetch-Site': 'cross-site',
-            'Priority': 'u=4',
-        }
-        session_id = self.session.headers['session']
-        headers['session'] = session_id
         params = {
             'ids': ids,
             'extend': 'label',
         }
 
-        response = self.session.get('https://prod.suggestedtv.com/api/client/v1/product', params=params, headers=headers)
+        response = self.session.get('https://prod.suggestedtv.com/api/client/v1/product', params=params)
         if response.status_code == 200:
-            mydata=json.loads(response.text)
+            mydata = response.json()
             titles = mydata['data']
             episodes =[
                     Episode(
@@ -265,27 +239,11 @@ class TPTV(Service):
     def get_tracks(self, title: Union[Movie, Episode]) -> Tracks:
         playlist = f"https://edge.api.brightcove.com/playback/v1/accounts/6272132012001/videos/{title.data.get('id')}"
 
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64; rv:138.0) Gecko/20100101 Firefox/138.0',
-            'Accept': '*/*',
-            'Accept-Language': 'en-GB,en;q=0.5',
-      
-            'Referer': 'https://tptvencore.co.uk/',
-            'BCOV-Policy': 'BCpkADawqM1yq3Go9abHJ4lBZ0wrYStC-pS1W01hdlACHxsiIz9AvQXy1wa3iqyd6yVJLXLZnZjFkKI2BCJjbtxiJqyPMZjIezEWKrI1TTSbugkD6dAXs7Ucxq09P9zQ8ZRU4ZjTa83VFhiL',
-            'Origin': 'https://tptvencore.co.uk',
-            'DNT': '1',
-            'Connection': 'keep-alive',
-            'Sec-Fetch-Dest': 'empty',
-            'Sec-Fetch-Mode': 'cors',
-            'Sec-Fetch-Site': 'cross-site',
-            'Priority': 'u=4',
-        }
-
-        r = requests.get(playlist, headers=headers)
+        r = self.bcov_session.get(playlist)
         if r.status_code != 200:
             raise ConnectionError(r.text)
 
-        data = r.json()
+        data = json_loads(r.content)
         
         self.manifest = data["sources"][2].get("src")
 
@@ -294,7 +252,7 @@ class TPTV(Service):
         
         # odd couple of DRM vids found
 
-        self.license = get_widevine_license_url(r.text)
+        self.license = get_widevine_license_url(data, r.content)
         
         
         return tracks
@@ -312,6 +270,45 @@ class TPTV(Service):
             raise ConnectionError(r.text)
         return r.content
 
+    def new_session(self) -> str:
+        r = self.session.post(
+            self.config["endpoints"]["session"],
+            headers={**self.config["session"], "Priority": "u=0"},
+            json={},
+        )
+        if r.status_code != 200:
+            raise ConnectionError(r.text)
+
+        session_id = r.json()['id']
+        self.session.headers.update({'session': session_id})
+        self.session_cache.set(session_id, expiration=86400)
+        return session_id
+
+    def renew_session(self, r: requests.Response, *_: Any, **kwargs: Any) -> Optional[requests.Response]:
+        # response hook: a cached session id that the API no longer accepts is replaced and the request retried once
+        if r.status_code != 401 or getattr(r.request, "session_renewed", False):
+            return None
+        if r.request.url == self.config["endpoints"]["session"]:
+            return None
+
+        # release the rejected response's connection back to the pool before resending
+        r.close()
+        session_id = self.new_session()
+        request = r.request.copy()
+        request.headers['session'] = session_id
+        request.session_renewed = True
+        # kwargs carries the original timeout, verify, proxies, ... so the retry is sent the same way
+        return self.session.send(request, **kwargs)
+
+    def get_collection_items(self, collection_id: str) -> list:
+        collection_url = f"https://prod.suggestedtv.com/api/client/v1/collection/by-reference/{collection_id}?extend=label"
+        response = self.session.get(collection_url)
+        if response.status_code != 200:
+            print(f"Error: {response.status_code} - {response.text}")
+            return []
+
+        return [item['id'].replace('product_','') for item in response.json()['children']]
+
     def get_data(self, url: str) -> dict:
         self.session.headers.update({'tenant': 'encore'})
         if 'collection' in url:
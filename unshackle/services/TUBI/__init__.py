@@ -1,11 +1,11 @@
 from __future__ import annotations
 
 import hashlib
-import os
 import re
 import sys
 import uuid
 from collections.abc import Generator
+from functools import lru_cache
 from http.cookiejar import MozillaCookieJar
 from typing import Any, Optional
 
@@ -19,6 +19,15 @@ from unshackle.core.search_result import SearchResult
 from unshackle.core.service import Service
 from unshackle.core.titles import Episode, Movie, Movies, Series, Title_T, Titles_T
 from unshackle.core.tracks import Audio, Chapter, Chapters, Subtitle, Track, Tracks
+from unshackle.core.utils.json import json_loads
+
+DESCRIPTIVE_ROLES = frozenset({"description", "alternative", "alternate"})
+
+
+@lru_cache(maxsize=64)
+def _alpha3(lang: Optional[str]) -> str:
+    """Episodes of a series nearly always share a language, so resolve each code only once."""
+    return Language.find(lang or "en").to_alpha3()
 
 
 class TUBI(Service):
@@ -54,7 +63,9 @@ class TUBI(Service):
         - Search is currently disabled.
     """
 
-    TITLE_RE = r"^(?:https?://(?:www\.)?tubitv\.com?)?/(?:[a-z]{2}-[a-z]{2}/)?(?P<type>movies|series|tv-shows)/(?P<id>[a-z0-9-]+)"
+    TITLE_RE = re.compile(
+        r"^(?:https?://(?:www\.)?tubitv\.com?)?/(?:[a-z]{2}-[a-z]{2}/)?(?P<type>movies|series|tv-shows)/(?P<id>[a-z0-9-]+)"
+    )
 
     @staticmethod
     @click.command(name="TUBI", short_help="https://tubitv.com/", help=__doc__)
@@ -73,6 +84,8 @@ class TUBI(Service):
         vcodec = ctx.parent.params.get("vcodec")
         self.vcodec = "H264" if vcodec is None else "H265"
 
+        self.device_id = str(uuid.uuid4())
+
     def authenticate(self, cookies: Optional[MozillaCookieJar] = None, credential: Optional[Credential] = None) -> None:
         super().authenticate(cookies, credential)
         self.auth_token = None
@@ -116,15 +129,15 @@ class TUBI(Service):
     #         )
 
     def get_titles(self) -> Titles_T:
-        try:
-            kind, content_id = (re.match(self.TITLE_RE, self.title).group(i) for i in ("type", "id"))
-        except Exception:
+        match = self.TITLE_RE.match(self.title)
+        if not match:
             raise ValueError("Could not parse ID from title - is the URL correct?")
+        kind, content_id = match["type"], match["id"]
 
         params = {
             "app_id": "tubitv",
             "platform": "web", # web, android, androidtv
-            "device_id": str(uuid.uuid4()),
+            "device_id": self.device_id,
             "content_id": content_id,
             "limit_resolutions[]": [
                 "h264_1080p",
@@ -140,33 +153,38 @@ class TUBI(Service):
         if kind == "tv-shows":
             content = self.session.get(self.config["endpoints"]["content"], params=params)
             content.raise_for_status()
-            series_id = "0" + content.json().get("series_id")
-            params.update({"content_id": int(series_id)})
-            data = self.session.get(self.config["endpoints"]["content"], params=params).json()
-
-            return Series(
-                [
-                    Episode(
-                        id_=episode["id"],
-                        service=self.__class__,
-                        title=data["title"],
-                        season=int(season.get("id", 0)),
-                        number=int(episode.get("episode_number", 0)),
-                        name=episode["title"].split("-")[1],
-                        year=data.get("year"),
-                        language=Language.find(episode.get("lang", "en")).to_alpha3(),
-                        data=episode,
+            data = json_loads(content.content)
+            if "children" not in data:
+                # the episode response doesn't carry the season tree, look it up through the series
+                params.update({"content_id": int("0" + data.get("series_id"))})
+                data = json_loads(self.session.get(self.config["endpoints"]["content"], params=params).content)
+
+            # only the requested episode is wanted, so stop at the first match
+            for season in data["children"]:
+                episode = next((x for x in season["children"] if x["id"] == content_id), None)
+                if episode:
+                    return Series(
+                        [
+                            Episode(
+                                id_=episode["id"],
+                                service=self.__class__,
+                                title=data["title"],
+                                season=int(season.get("id", 0)),
+                                number=int(episode.get("episode_number", 0)),
+                                name=episode["title"].partition("-")[2],
+                                year=data.get("year"),
+                                language=_alpha3(episode.get("lang")),
+                                data=episode,
+                            )
+                        ]
                     )
-                    for season in data["children"]
-                    for episode in season["children"]
-                    if episode["id"] == content_id
-                ]
-            )
+
+            return Series([])
 
         if kind == "series":
             r = self.session.get(self.config["endpoints"]["content"], params=params)
             r.raise_for_status()
-            data = r.json()
+            data = json_loads(r.content)
 
             return Series(
                 [
@@ -176,9 +194,9 @@ class TUBI(Service):
                         title=data["title"],
                         season=int(season.get("id", 0)),
                         number=int(episode.get("episode_number", 0)),
-                        name=episode["title"].split("-")[1],
+                        name=episode["title"].partition("-")[2],
                         year=data.get("year"),
-                        language=Language.find(episode.get("lang") or "en").to_alpha3(),
+                        language=_alpha3(episode.get("lang")),
                         data=episode,
                     )
                     for season in data["children"]
@@ -189,7 +207,7 @@ class TUBI(Service):
         if kind == "movies":
             r = self.session.get(self.config["endpoints"]["content"], params=params)
             r.raise_for_status()
-            data = r.json()
+            data = json_loads(r.content)
             return Movies(
                 [
                     Movie(
@@ -197,7 +215,7 @@ class TUBI(Service):
                         service=self.__class__,
                         year=data.get("year"),
                         name=data["title"],
-                        language=Language.find(data.get("lang", "en")).to_alpha3(),
+                        language=_alpha3(data.get("lang")),
                         data=data,
                     )
                 ]
@@ -209,19 +227,22 @@ class TUBI(Service):
             self.log.info(f"Title is available in: {title.data.get('country')}")
             sys.exit(1)
 
-        codecs = [x.get("codec") for x in resources]
-        if not any(self.vcodec in x for x in codecs):
+        if not any(self.vcodec in (x.get("codec") or "") for x in resources):
             raise ValueError(f"Could not find a {self.vcodec} video resource for this title")
 
-        resource = next((
-            x for x in resources
-            if self.drm_system in x.get("type", "") and self.vcodec in x.get("codec", "")
-        ), None) or next((
-            x for x in resources
-            if self.drm_system not in x.get("type", "") and
-            "dash" in x.get("type", "") and
-            self.vcodec in x.get("codec", "")
-        ), None)
+        # prefer the resource for our DRM system, otherwise the first other DASH one
+        resource = fallback = None
+        for x in resources:
+            resource_type = x.get("type", "")
+            if self.vcodec not in x.get("codec", ""):
+                continue
+            if self.drm_system in resource_type:
+                resource = x
+                break
+            if fallback is None and "dash" in resource_type:
+                fallback = x
+
+        resource = resource or fallback
         if not resource:
             raise ValueError("Could not find a video resource for this title")
 
@@ -231,28 +252,38 @@ class TUBI(Service):
         
         title.data["license_url"] = resource.get("license_server", {}).get("url")
 
-        tracks = DASH.from_url(url=manifest, session=self.session).to_tracks(language=title.language)
+        dash = DASH.from_url(url=manifest, session=self.session)
+        tracks = dash.to_tracks(language=title.language)
+
+        # index BaseURL and Role elements by parent in one walk rather than searching per track,
+        # keeping the first one per parent as Element.find() would
+        base_urls: dict = {}
+        for el in dash.manifest.iter("BaseURL"):
+            base_urls.setdefault(el.getparent(), el.text)
+        roles: dict = {}
+        for el in dash.manifest.iter("Role"):
+            roles.setdefault(el.getparent(), el.get("value"))
+
         for track in tracks:
-            rep_base = track.data["dash"]["representation"].find("BaseURL")
-            if rep_base is not None:
-                base_url = os.path.dirname(track.url)
-                track_base = rep_base.text
+            track_dash = track.data["dash"]
+            track_base = base_urls.get(track_dash["representation"])
+            if track_base is not None:
+                base_url = track.url.rpartition("/")[0]
                 track.url = f"{base_url}/{track_base}"
                 track.descriptor = Track.Descriptor.URL
                 track.downloader = aria2c
 
-            if isinstance(track, Audio):
-                role = track.data["dash"]["adaptation_set"].find("Role")
-                if role is not None and role.get("value") in ["description", "alternative", "alternate"]:
-                    track.descriptive = True
+            if isinstance(track, Audio) and roles.get(track_dash["adaptation_set"]) in DESCRIPTIVE_ROLES:
+                track.descriptive = True
 
         if title.data.get("subtitles"):
+            subtitle = title.data["subtitles"][0]
             tracks.add(
                 Subtitle(
-                    id_=hashlib.md5(title.data["subtitles"][0]["url"].encode()).hexdigest()[0:6],
-                    url=title.data["subtitles"][0]["url"],
-                    codec=Subtitle.Codec.from_mime(title.data["subtitles"][0]["url"][-3:]),
-                    language=title.data["subtitles"][0].get("lang_alpha3", title.language),
+                    id_=hashlib.blake2s(subtitle["url"].encode(), digest_size=3).hexdigest(),
+                    url=subtitle["url"],
+                    codec=Subtitle.Codec.from_mime(subtitle["url"][-3:]),
+                    language=subtitle.get("lang_alpha3", title.language),
                     downloader=requests,
                     is_original_lang=True,
                     forced=False,
@@ -279,7 +310,7 @@ class TUBI(Service):
         if not any(c.timestamp == "00:00:00.000" for c in chapters):
             chapters.append(Chapter(timestamp=0))
 
-        return sorted(chapters, key=lambda x: x.timestamp)
+        return Chapters(chapters)
 
     def get_widevine_service_certificate(self, **_: Any) -> str:
         return None
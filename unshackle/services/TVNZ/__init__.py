@@ -1,9 +1,10 @@
 from __future__ import annotations
 
-import json
 from collections.abc import Generator
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
 from http.cookiejar import MozillaCookieJar
+from itertools import chain
 from typing import Any, Optional, Union
 from urllib.parse import urljoin, urlparse
 
@@ -12,12 +13,17 @@ from click import Context
 from lxml import etree
 from pywidevine.cdm import Cdm as WidevineCdm
 from requests import Request
+from requests.adapters import HTTPAdapter
 from unshackle.core.credential import Credential
 from unshackle.core.manifests.dash import DASH
 from unshackle.core.search_result import SearchResult
 from unshackle.core.service import Service
 from unshackle.core.titles import Episode, Movie, Movies, Series
 from unshackle.core.tracks import Chapters, Tracks
+from unshackle.core.utils.json import json_loads
+from unshackle.core.utils.xml import load_xml
+
+DESCRIPTIVE_ROLES = frozenset({"description", "alternative", "alternate"})
 
 
 class TVNZ(Service):
@@ -56,6 +62,17 @@ class TVNZ(Service):
         super().__init__(ctx)
 
         self.session.headers.update(self.config["headers"])
+        self.base_api = self.config["endpoints"]["base_api"].rstrip("/")
+        # Disable SSL verification due to issues with newer versions of requests library.
+        self.session.verify = False
+
+        adapter = HTTPAdapter(
+            pool_connections=16,
+            pool_maxsize=32,
+            max_retries=self.session.adapters["https://"].max_retries,
+            pool_block=True,
+        )
+        self.session.mount("https://", adapter)
 
     def search(self) -> Generator[SearchResult, None, None]:
         params = {
@@ -89,7 +106,7 @@ class TVNZ(Service):
             payload = {"email": credential.username, "password": credential.password, "keepMeLoggedIn": True}
 
             response = self.session.post(
-                self.config["endpoints"]["base_api"] + "/api/v1/androidtv/consumer/login", json=payload
+                self.base_api + "/api/v1/androidtv/consumer/login", json=payload
             )
             response.raise_for_status()
             if not response.headers.get("aat"):
@@ -104,9 +121,6 @@ class TVNZ(Service):
 
         self.session.headers.update({"Authorization": "Bearer {}".format(tokens["access_token"])})
 
-        # Disable SSL verification due to issues with newer versions of requests library.
-        self.session.verify = False
-
     def get_titles(self) -> Union[Movies, Series]:
         try:
             path = urlparse(self.title).path
@@ -129,14 +143,8 @@ class TVNZ(Service):
 
             seasons = [x.get("href") for x in lists]
 
-            episodes = []
-            for season in seasons:
-                data = self._request("GET", season)
-                episodes.extend([x for x in data["_embedded"].values()])
-
-                while data.get("nextPage"):
-                    data = self._request("GET", data["nextPage"])
-                    episodes.extend([x for x in data["_embedded"].values()])
+            with ThreadPoolExecutor(max_workers=min(8, len(seasons)) or 1) as executor:
+                episodes = list(chain.from_iterable(executor.map(self._season, seasons)))
 
         if label in ("Episodes", "Stream"):
             episodes = self._show(episodes, title)
@@ -186,12 +194,17 @@ class TVNZ(Service):
                 None,
             )
 
-        manifest = self.trim_duration(source_manifest)
-        tracks = DASH.from_text(manifest, source_manifest).to_tracks(title.language)
+        r = self.session.get(source_manifest)
+        r.raise_for_status()
+
+        manifest = load_xml(r.content)
+        self.trim_duration(manifest)
+        tracks = DASH(manifest, r.url).to_tracks(title.language)
 
         for track in tracks.audio:
-            role = track.data["dash"]["representation"].find("Role")
-            if role is not None and role.get("value") in ["description", "alternative", "alternate"]:
+            if (
+                role := track.data["dash"]["representation"].find("Role")
+            ) is not None and role.get("value") in DESCRIPTIVE_ROLES:
                 track.descriptive = True
 
         return tracks
@@ -214,14 +227,24 @@ class TVNZ(Service):
 
     # Service specific
 
+    def _season(self, season: str) -> list:
+        data = self._request("GET", season)
+        episodes = list(data["_embedded"].values())
+
+        while data.get("nextPage"):
+            data = self._request("GET", data["nextPage"])
+            episodes.extend(data["_embedded"].values())
+
+        return episodes
+
     def _show(self, episodes: list, title: str) -> Episode:
         return [
             Episode(
                 id_=episode.get("videoId"),
                 service=self.__class__,
                 title=title,
-                season=int(episode.get("seasonNumber")) if episode.get("seasonNumber") else 0,
-                number=int(episode.get("episodeNumber")) if episode.get("episodeNumber") else 0,
+                season=int(n) if (n := episode.get("seasonNumber")) else 0,
+                number=int(n) if (n := episode.get("episodeNumber")) else 0,
                 name=episode.get("title"),
                 language="en",
                 data=episode,
@@ -256,8 +279,8 @@ class TVNZ(Service):
                 id_=video.get("videoId"),
                 service=self.__class__,
                 title=title,
-                season=int(video.get("seasonNumber")) if video.get("seasonNumber") else 0,
-                number=int(video.get("episodeNumber")) if video.get("episodeNumber") else 0,
+                season=int(n) if (n := video.get("seasonNumber")) else 0,
+                number=int(n) if (n := video.get("episodeNumber")) else 0,
                 name=name,
                 language="en",
                 data=video,
@@ -272,7 +295,11 @@ class TVNZ(Service):
         headers: dict = None,
         payload: dict = None,
     ) -> Any[dict | str]:
-        url = urljoin(self.config["endpoints"]["base_api"], api)
+        # most calls are root-relative API paths, which only need the host prepended
+        if api.startswith("/") and not api.startswith("//"):
+            url = self.base_api + api
+        else:
+            url = urljoin(self.base_api + "/", api)
         if headers:
             self.session.headers.update(headers)
 
@@ -280,7 +307,7 @@ class TVNZ(Service):
         response = self.session.send(prep)
 
         try:
-            data = json.loads(response.content)
+            data = json_loads(response.content)
 
             if data.get("message"):
                 raise ConnectionError(f"{response.status_code} - {data.get('message')}")
@@ -290,19 +317,21 @@ class TVNZ(Service):
         except Exception as e:
             raise ConnectionError("Request failed: {} - {}".format(response.status_code, response.text))
 
-    def trim_duration(self, source_manifest: str) -> str:
+    def trim_duration(self, manifest: etree.Element) -> None:
         """
         The last segment on all tracks return a 404 for some reason, causing a failed download.
         So we trim the duration by exactly one segment to account for that.
 
+        The MPD element is patched in place so the manifest is fetched and parsed only once.
+
         TODO: Calculate the segment duration instead of assuming length.
         """
-        manifest = DASH.from_url(source_manifest, self.session).manifest
         period_duration = manifest.get("mediaPresentationDuration")
+        if not period_duration:
+            return
+
         period_duration = DASH.pt_to_sec(period_duration)
 
         hours, minutes, seconds = str(timedelta(seconds=period_duration - 6)).split(":")
         new_duration = f"PT{hours}H{minutes}M{seconds}S"
         manifest.set("mediaPresentationDuration", new_duration)
-
-        return etree.tostring(manifest, encoding="unicode")
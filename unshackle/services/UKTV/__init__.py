@@ -2,7 +2,9 @@ from __future__ import annotations
 
 import re
 from collections.abc import Generator
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
+from itertools import chain
 from typing import Any, Union
 
 import click
@@ -13,6 +15,9 @@ from unshackle.core.search_result import SearchResult
 from unshackle.core.service import Service
 from unshackle.core.titles import Episode, Movie, Movies, Series
 from unshackle.core.tracks import Chapter, Chapters, Tracks
+from unshackle.core.utils.xml import load_xml
+
+DESCRIPTIVE_ROLES = frozenset({"description", "alternative", "alternate"})
 
 
 class UKTV(Service):
@@ -36,6 +41,10 @@ class UKTV(Service):
 
     GEOFENCE = ("gb",)
     ALIASES = ("uktvplay", "u",)
+    TITLE_RE = re.compile(
+        r"^(?:https?://(?:www\.)?u\.co.uk/shows/)?"
+        r"(?P<slug>[a-z0-9-]+)(?:/[a-z0-9-]+/[a-z0-9-]+/(?P<vid>[0-9-]+))?"
+    )
 
     @staticmethod
     @click.command(name="UKTV", short_help="https://u.co.uk/", help=__doc__)
@@ -50,6 +59,7 @@ class UKTV(Service):
 
         self.session.headers.update({"user-agent": "okhttp/4.7.2"})
         self.base = self.config["endpoints"]["base"]
+        self._season_cache: dict[int, dict] = {}
 
     def search(self) -> Generator[SearchResult, None, None]:
         r = self.session.get(self.base + f"search/?q={self.title}")
@@ -74,25 +84,33 @@ class UKTV(Service):
         r.raise_for_status()
         data = r.json()
 
-        series = [series["id"] for series in data["series"]]
-        seasons = [self.session.get(self.base + f"series/?id={i}").json() for i in series]
+        series = list(dict.fromkeys(series["id"] for series in data["series"]))
+        with ThreadPoolExecutor(max_workers=min(8, len(series)) or 1) as executor:
+            seasons = list(executor.map(self._season, series))
 
         if video:
+            # stop at the first match, both ids are normalised with int() as the API may pad them
+            video = int(video)
+            match = next(
+                (
+                    episode
+                    for episode in chain.from_iterable(season["episodes"] for season in seasons)
+                    if int(episode["video_id"]) == video
+                ),
+                None,
+            )
             episodes = [
                 Episode(
-                    id_=episode.get("video_id"),
+                    id_=match.get("video_id"),
                     service=self.__class__,
-                    title=episode.get("brand_name"),
-                    season=int(episode.get("series_number", 0)),
-                    number=int(episode.get("episode_number", 0)),
-                    name=episode.get("name"),
+                    title=match.get("brand_name"),
+                    season=int(match.get("series_number", 0)),
+                    number=int(match.get("episode_number", 0)),
+                    name=match.get("name"),
                     language="en",
-                    data=episode,
+                    data=match,
                 )
-                for season in seasons
-                for episode in season["episodes"]
-                if int(episode.get("video_id")) == int(video)
-            ]
+            ] if match else []
         else:
             episodes = [
                 Episode(
@@ -105,8 +123,7 @@ class UKTV(Service):
                     language="en",
                     data=episode,
                 )
-                for season in seasons
-                for episode in season["episodes"]
+                for episode in chain.from_iterable(season["episodes"] for season in seasons)
             ]
 
         return Series(episodes)
@@ -133,12 +150,17 @@ class UKTV(Service):
         if not self.license or not source_manifest:
             raise ValueError("Failed to get license or manifest")
 
-        manifest = self.trim_duration(source_manifest)
-        tracks = DASH.from_text(manifest, source_manifest).to_tracks(title.language)
+        r = self.session.get(source_manifest)
+        r.raise_for_status()
+
+        manifest = load_xml(r.content)
+        self.trim_duration(manifest)
+        tracks = DASH(manifest, r.url).to_tracks(title.language)
 
         for track in tracks.audio:
-            role = track.data["dash"]["representation"].find("Role")
-            if role is not None and role.get("value") in ["description", "alternative", "alternate"]:
+            if (
+                role := track.data["dash"]["representation"].find("Role")
+            ) is not None and role.get("value") in DESCRIPTIVE_ROLES:
                 track.descriptive = True
 
         return tracks
@@ -161,34 +183,37 @@ class UKTV(Service):
 
     # Service specific functions
 
+    def _season(self, series_id: int) -> dict:
+        if series_id not in self._season_cache:
+            r = self.session.get(self.base + f"series/?id={series_id}")
+            r.raise_for_status()
+            self._season_cache[series_id] = r.json()
+        return self._season_cache[series_id]
+
     @staticmethod
     def parse_title(title: str) -> tuple[str, str]:
-        title_re = (
-            r"^(?:https?://(?:www\.)?u\.co.uk/shows/)?"
-            r"(?P<slug>[a-z0-9-]+)(?:/[a-z0-9-]+/[a-z0-9-]+/(?P<vid>[0-9-]+))?"
-        )
-
-        try:
-            slug, video = (re.match(title_re, title).group(i) for i in ("slug", "vid"))
-        except Exception:
+        match = UKTV.TITLE_RE.match(title)
+        if not match:
             raise ValueError("Could not parse ID from title - is the URL correct?")
 
-        return slug, video
+        return match["slug"], match["vid"]
 
     @staticmethod
-    def trim_duration(source_manifest: str) -> str:
+    def trim_duration(manifest: etree.Element) -> None:
         """
         The last segment on all tracks return a 404 for some reason, causing a failed download.
         So we trim the duration by exactly one segment to account for that.
 
-        TODO: Calculate the segment duration instead of assuming length. 
+        The MPD element is patched in place so the manifest is fetched and parsed only once.
+
+        TODO: Calculate the segment duration instead of assuming length.
         """
-        manifest = DASH.from_url(source_manifest).manifest
         period_duration = manifest.get("mediaPresentationDuration")
+        if not period_duration:
+            return
+
         period_duration = DASH.pt_to_sec(period_duration)
 
         hours, minutes, seconds = str(timedelta(seconds=period_duration - 6)).split(":")
         new_duration = f"PT{hours}H{minutes}M{seconds}S"
         manifest.set("mediaPresentationDuration", new_duration)
-
-        return etree.tostring(manifest, encoding="unicode")
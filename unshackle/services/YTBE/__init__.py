@@ -4,7 +4,6 @@ from http.cookiejar import CookieJar
 from typing import Optional, Union, Any
 from urllib.parse import urlparse
 import click
-import requests
 from requests.adapters import HTTPAdapter, Retry
 from rich.padding import Padding
 from rich.rule import Rule
@@ -18,12 +17,66 @@ from unshackle.core.credential import Credential
 from unshackle.core.tracks import Chapters, Tracks, Subtitle, Chapter
 from unshackle.core.utilities import get_ip_info
 from unshackle.core.manifests import HLS, DASH
+from unshackle.core.utils.json import json_loads
 
-from bs4 import BeautifulSoup
 import hashlib
 import base64
 import re
 import json
+import time
+from functools import lru_cache
+
+# matched against the raw page bytes so the ~1MB watch page is never built into a tree
+YTCFG_RE = re.compile(rb'ytcfg\.set\((.*?)\);', re.DOTALL)
+
+
+@lru_cache(maxsize=4)
+def _sapisid_hash(epoch: int, sapisid: str, origin: str) -> str:
+    return hashlib.sha1(f"{epoch} {sapisid} {origin}".encode('utf-8')).hexdigest()
+
+
+def _parse_ytcfg(content: bytes) -> dict[str, Any]:
+    user_agent_extracted = "YouTube/15.49.4 (Linux; Android 11; Pixel 5) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/96.0.4664.45 Mobile Safari/537.36 EdgA/46.0.0.1 GoogleTV/YouTube/16.12.34 (compatible; Widevine/1.4.8)"
+    client_name_extracted = "null"
+    client_version_extracted = "null"
+    id_token_extracted = "null"
+    vision_data_extracted = "null"
+    session_id_extracted = "null"
+    logged_yt_extracted = None  # stays None until a block carrying LOGGED_IN is seen
+
+    for match in YTCFG_RE.finditer(content):
+        try:
+            ytcfg_set_content = json_loads(match.group(1))
+            if isinstance(ytcfg_set_content, dict):
+                client_context = ytcfg_set_content.get('INNERTUBE_CONTEXT', {}).get('client', {})
+                id_token_extracted = ytcfg_set_content.get("ID_TOKEN", id_token_extracted)
+                vision_data_extracted = client_context.get("visitorData", vision_data_extracted)
+                session_id_extracted = ytcfg_set_content.get("SESSION_INDEX", session_id_extracted)
+                user_agent_extracted = client_context.get('userAgent', user_agent_extracted)
+                client_version_extracted = client_context.get('clientVersion', client_version_extracted)
+                client_name_extracted = client_context.get('clientName', client_name_extracted)
+                logged_yt_extracted = ytcfg_set_content.get("LOGGED_IN", logged_yt_extracted)
+        # orjson.JSONDecodeError subclasses json.JSONDecodeError
+        except json.JSONDecodeError:
+            continue
+
+        # stop decoding further ytcfg blocks once the fields the player request needs are all known
+        if "null" not in (
+            client_name_extracted, client_version_extracted, vision_data_extracted, id_token_extracted,
+            session_id_extracted
+        ) and logged_yt_extracted is not None:
+            break
+
+    return {
+        'user_agent': user_agent_extracted,
+        'client_name': client_name_extracted,
+        'client_version': client_version_extracted,
+        'id_token': id_token_extracted,
+        'vision_data': vision_data_extracted,
+        'session_id': session_id_extracted,
+        'logged_yt': False if logged_yt_extracted is None else logged_yt_extracted,
+    }
+
 
 class YTBE(Service):
     """
@@ -55,7 +108,10 @@ class YTBE(Service):
 
     def __init__(self, ctx, title):
         self.title = title
-        self.last_response_data: dict[str, Any] = {}
+        self.dash_manifest_url: Optional[str] = None
+        self.drm_params: Optional[str] = None
+        self.ytcfg_params: dict[str, Any] = {}
+        self.request_headers: dict[str, str] = {}
         super().__init__(ctx)
 
     def get_titles(self) -> Titles_T:
@@ -64,43 +120,27 @@ class YTBE(Service):
         cookies_d: dict[str, str] = self.session.cookies.get_dict()
 
         sapisid = cookies_d.get('__Secure-3PAPISID', '')
-        epoch = "1699161578"
+        # a fresh timestamp, rounded to the minute so repeated calls can reuse the hash
+        epoch = int(time.time()) // 60 * 60
         origin = "https://www.youtube.com"
-        data = f"{epoch} {sapisid} {origin}"
-        sha1 = hashlib.sha1()
-        sha1.update(data.encode('utf-8'))
-        sapisidhash = f"SAPISIDHASH {epoch}_{sha1.hexdigest()}"
-
-        response = self.session.get(youtube_url)
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        yt_scripts = soup.find_all('script', string=re.compile('ytcfg.set'))
-
-        user_agent_extracted = "YouTube/15.49.4 (Linux; Android 11; Pixel 5) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/96.0.4664.45 Mobile Safari/537.36 EdgA/46.0.0.1 GoogleTV/YouTube/16.12.34 (compatible; Widevine/1.4.8)"
-        client_name_extracted = "null"
-        client_version_extracted = "null"
-        id_token_extracted = "null"
-        vision_data_extracted = "null"
-        session_id_extracted = "null"
-        logged_yt_extracted = False
-
-        for yt_script in yt_scripts:
-            yt_script_content = yt_script.string
-            try:
-                match = re.search(r'ytcfg\.set\((.*?)\);', yt_script_content, re.DOTALL)
-                if match:
-                    ytcfg_set_content = json.loads(match.group(1))
-                    id_token_extracted = ytcfg_set_content.get("ID_TOKEN", id_token_extracted)
-                    vision_data_extracted = ytcfg_set_content.get("INNERTUBE_CONTEXT", {}).get("client", {}).get("visitorData", vision_data_extracted)
-                    session_id_extracted = ytcfg_set_content.get("SESSION_INDEX", session_id_extracted)
-                    client_context = ytcfg_set_content.get('INNERTUBE_CONTEXT', {}).get('client', {})
-                    user_agent_extracted = client_context.get('userAgent', user_agent_extracted)
-                    client_version_extracted = client_context.get('clientVersion', client_version_extracted)
-                    client_name_extracted = client_context.get('clientName', client_name_extracted)
-                    logged_yt_extracted = ytcfg_set_content.get("LOGGED_IN", logged_yt_extracted)
-            except json.JSONDecodeError:
-                pass
-        
+        sapisidhash = f"SAPISIDHASH {epoch}_{_sapisid_hash(epoch, sapisid, origin)}"
+
+        # the ytcfg blocks sit near the top of the page, so try the first 256KiB before fetching it all
+        response = self.session.get(youtube_url, headers={'Range': 'bytes=0-262143'})
+        ytcfg = _parse_ytcfg(response.content)
+        if response.status_code == 206 and "null" in (
+            ytcfg['client_name'], ytcfg['client_version'], ytcfg['vision_data'], ytcfg['id_token'], ytcfg['session_id']
+        ):
+            ytcfg = _parse_ytcfg(self.session.get(youtube_url).content)
+
+        user_agent_extracted = ytcfg['user_agent']
+        client_name_extracted = ytcfg['client_name']
+        client_version_extracted = ytcfg['client_version']
+        id_token_extracted = ytcfg['id_token']
+        vision_data_extracted = ytcfg['vision_data']
+        session_id_extracted = ytcfg['session_id']
+        logged_yt_extracted = ytcfg['logged_yt']
+
         headers = {
             'authorization': sapisidhash,
             'origin': origin,
@@ -126,7 +166,13 @@ class YTBE(Service):
             'videoId': self.title
         }
 
-        response_data = self.session.post(self.YOUTUBE_VIDEO_INFO_URL, params=params_get_titles, headers=headers, json=json_data_payload).json()
+        response = self.session.post(self.YOUTUBE_VIDEO_INFO_URL, params=params_get_titles, headers=headers, json=json_data_payload)
+        # only these sections are used later, drop the rest (captions, storyboards, endscreens, ...) right away
+        response_data = {
+            key: value
+            for key, value in json_loads(response.content).items()
+            if key in ('streamingData', 'videoDetails', 'playabilityStatus')
+        }
 
         streaming_data = response_data.get('streamingData')
         if not streaming_data:
@@ -134,8 +180,10 @@ class YTBE(Service):
 
         title_name = response_data['videoDetails']['title']
         
-        self.last_response_data = response_data
-        self.last_response_data['ytcfg_params'] = {
+        # keep just what get_tracks and get_widevine_license need rather than the whole player response
+        self.dash_manifest_url = streaming_data.get('dashManifestUrl')
+        self.drm_params = streaming_data.get('drmParams')
+        self.ytcfg_params = {
             'user_agent': user_agent_extracted,
             'client_name': client_name_extracted,
             'client_version': client_version_extracted,
@@ -145,7 +193,7 @@ class YTBE(Service):
             'logged_yt': logged_yt_extracted,
             'video_id': self.title
         }
-        self.last_response_data['request_headers'] = headers
+        self.request_headers = headers
         
         return Movies([Movie(
             id_=self.title,
@@ -156,26 +204,22 @@ class YTBE(Service):
         )])
 
     def get_tracks(self, title_obj: Title_T) -> Tracks:
-        response_data = self.last_response_data
-        dashManifestUrl = response_data.get('streamingData', {}).get('dashManifestUrl')
-
-        return DASH.from_url(dashManifestUrl, session=self.session).to_tracks(language="en")
+        return DASH.from_url(self.dash_manifest_url, session=self.session).to_tracks(language="en")
 
     def get_chapters(self, title: Title_T) -> Chapters:
         return []
 
     def get_widevine_license(self, *, challenge: bytes, title: Title_T, track: AnyTrack) -> Optional[str]:
-        response_data = self.last_response_data
-        drm_params = response_data.get("streamingData", {}).get("drmParams")
+        drm_params = self.drm_params
 
-        ytcfg_params = response_data.get('ytcfg_params', {})
+        ytcfg_params = self.ytcfg_params
         user_agent = ytcfg_params.get('user_agent')
         clientName = ytcfg_params.get('client_name')
         clientVersion = ytcfg_params.get('client_version')
         video_id = ytcfg_params.get('video_id')
         session_id = ytcfg_params.get('session_id')
 
-        request_headers = response_data.get('request_headers', {})
+        request_headers = self.request_headers
 
         lic_url = self.LICENSE_SERVER_URL
 
@@ -198,7 +242,7 @@ class YTBE(Service):
 
         json_data["licenseRequest"] = base64.b64encode(challenge).decode("utf-8")
 
-        get_res = requests.post(lic_url, params=params_license, headers=request_headers, json=json_data).json()
+        get_res = json_loads(self.session.post(lic_url, params=params_license, headers=request_headers, json=json_data).content)
         license_b64 = get_res.get("license")
         if license_b64:
             return license_b64.replace("-", "+").replace("_", "/")
@@ -1,17 +1,30 @@
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from http.cookiejar import MozillaCookieJar
 from typing import Any, Optional, Union
+import json
 import sys
 import re
 
 import click
 from click import Context
+from requests.adapters import HTTPAdapter
 
 from unshackle.core.credential import Credential
 from unshackle.core.service import Service
 from unshackle.core.titles import Movie, Movies, Episode, Series
 from unshackle.core.tracks import Track, Chapter, Tracks, Video, Subtitle
+from unshackle.core.utils.json import json_loads
+
+APIKEY_RE = re.compile(r'.+GLOBALS\.apikey += +"(?P<header>[^"\n]+).+";', re.DOTALL)
+
+
+@lru_cache(maxsize=32)
+def _fake_episode_name_re(series_title: str) -> re.Pattern:
+	"""Episodes of a series share a title, so build the pattern once per series."""
+	return re.compile(fr"^(Folge \d+|{re.escape(series_title)} \(\d+/\d+\))$")
 
 
 class ZDF(Service):
@@ -27,8 +40,15 @@ class ZDF(Service):
 	"""
 
 	GEOFENCE = ("de",)
-	VIDEO_RE = r"^https://www\.zdf\.de/(play|video)/(?P<content_type>.+)/(?P<series_slug>.+)/(?P<item_slug>[^\?]+)(\?.+)?$"
-	SERIES_RE = r"^https://www.zdf.de/serien/(?P<slug>[^\?]+)(\?.+)?$"
+	VIDEO_RE = re.compile(r"^https://www\.zdf\.de/(play|video)/(?P<content_type>.+)/(?P<series_slug>.+)/(?P<item_slug>[^\?]+)(\?.+)?$")
+	SERIES_RE = re.compile(r"^https://www.zdf.de/serien/(?P<slug>[^\?]+)(\?.+)?$")
+	# persisted GraphQL query for series pages, pre-serialised since it never changes
+	SERIES_PAGE_EXTENSIONS = json.dumps({
+		"persistedQuery": {
+			"version": 1,
+			"sha256Hash": "9412a0f4ac55dc37d46975d461ec64bfd14380d815df843a1492348f77b5c99a"
+		}
+	}, separators=(",", ":"))
 	VIDEO_CODEC_MAP = {
 		"video/mp4": Video.Codec.AVC,
 		"video/webm": Video.Codec.VP9
@@ -45,84 +65,111 @@ class ZDF(Service):
 		self.title = title
 		super().__init__(ctx)
 
+		adapter = HTTPAdapter(
+			pool_connections=16,
+			pool_maxsize=16,
+			max_retries=self.session.adapters["https://"].max_retries,
+			pool_block=True,
+		)
+		self.session.mount("https://", adapter)
+
 	def authenticate(self, cookies: Optional[MozillaCookieJar] = None, credential: Optional[Credential] = None) -> None:
-		# This seems to be more or less static, but it's easy enough to fetch every time
-		r = self.session.get("http://hbbtv.zdf.de/zdfm3/index.php")
-		match = re.match(r'.+GLOBALS\.apikey += +"(?P<header>[^"\n]+).+";', r.text, re.DOTALL)
-		self.session.headers.update({"Api-Auth": match.group('header')})
+		# This seems to be more or less static, so it is cached for an hour rather than fetched for every title
+		cache = self.cache.get("api_auth")
+		if cache and not cache.expired:
+			api_auth = cache.data
+		else:
+			r = self.session.get("http://hbbtv.zdf.de/zdfm3/index.php")
+			match = APIKEY_RE.match(r.text)
+			if not match:
+				raise ValueError("Failed to find the API key on the ZDF HbbTV page")
+
+			api_auth = match.group('header')
+			cache.set(api_auth, expiration=3600)
+
+		self.session.headers.update({"Api-Auth": api_auth})
 
 	def get_titles(self) -> Union[Movies, Series]:
-		if match := re.match(self.SERIES_RE, self.title):
+		if match := self.SERIES_RE.match(self.title):
 			return self.handle_series_page(match.group('slug'))
 
-		if match := re.match(self.VIDEO_RE, self.title):
+		if match := self.VIDEO_RE.match(self.title):
 			r = self.session.post(self.config["endpoints"]["graphql"], json={
 				"operationName": "VideoByCanonical",
 				"query": self.config["queries"]["VideoByCanonical"],
 				"variables": {"canonical": match.group('item_slug'), "first": 1},
 			}, headers={"content-type": "application/json"})
 
-			video = r.json()["data"]["videoByCanonical"]
+			video = json_loads(r.content)["data"]["videoByCanonical"]
 			return self.parse_video_data(video)
 
 	def get_tracks(self, title: Union[Episode, Movie]) -> Tracks:
+		ptmd_base = self.config["endpoints"]["ptmd_base"]
+		player_types = self.config["meta"]["player_types"]
+		ptmd_urls = [
+			ptmd_base + node["ptmdTemplate"].replace("{playerId}", player_type)
+			for node in title.data["nodes"]
+			if node["vodMediaType"] == "DEFAULT"
+			for player_type in player_types
+		]
+
+		# fetch every PTMD document up front, then add tracks in the original order
+		with ThreadPoolExecutor(max_workers=min(16, len(ptmd_urls)) or 1) as executor:
+			ptmds = list(executor.map(lambda url: json_loads(self.session.get(url).content), ptmd_urls))
+
 		tracks = Tracks()
-		for node in title.data["nodes"]:
-			if node["vodMediaType"] != "DEFAULT":
-				continue
-
-			for player_type in self.config["meta"]["player_types"]:
-				ptmd_url = (self.config["endpoints"]["ptmd_base"] +
-					node["ptmdTemplate"].format(playerId=player_type))
-
-				r = self.session.get(ptmd_url)
-				ptmd = r.json()
-
-				for pl in ptmd["priorityList"]:
-					for media_format in pl["formitaeten"]:
-						if "restriction_useragent" in media_format["facets"] or media_format["mimeType"] not in self.VIDEO_CODEC_MAP.keys():
-							continue
-
-						if 'hdr_hlg' in media_format["facets"]:
-							video_range = Video.Range.HLG
-							video_codec = Video.Codec.HEVC
-						else:
-							video_range = Video.Range.SDR
-							video_codec = self.VIDEO_CODEC_MAP[media_format["mimeType"]]
-
-						for quality in media_format["qualities"]:
-							for track in quality["audio"]["tracks"]:
-								if track["class"] not in ("main", "ot"):
-									continue
-
-								track_id = f'{video_codec}-{track["language"]}-{quality["highestVerticalResolution"]}'
-								if tracks.exists(by_id=track_id):
-									continue
-
-								tracks.add(Video(
-									id_=track_id,
-									codec=video_codec,
-									range_=video_range,
-									width=quality["highestVerticalResolution"] // 9 * 16,
-									height=quality["highestVerticalResolution"],
-									url=track["uri"],
-									language=track["language"],
-									fps=50,
-								))
-
-				for subs in ptmd["captions"]:
-					if subs["format"] == "ebu-tt-d-basic-de":
-						track_id = f'subs-{subs["language"]}-{subs["class"]}'
-						if tracks.exists(by_id=track_id):
-							continue
-
-						tracks.add(Subtitle(
-							id_=track_id,
-							codec=Subtitle.Codec.TimedTextMarkupLang,
-							language=subs["language"],
-							sdh=subs["class"] == "hoh",
-							url=subs["uri"]
-						))
+		# Tracks.exists() scans every added track, so keep the raw id parts in sets instead
+		seen_video: set[tuple] = set()
+		seen_subs: set[tuple] = set()
+		for ptmd in ptmds:
+			for pl in ptmd["priorityList"]:
+				for media_format in pl["formitaeten"]:
+					if "restriction_useragent" in media_format["facets"] or media_format["mimeType"] not in self.VIDEO_CODEC_MAP:
+						continue
+
+					if 'hdr_hlg' in media_format["facets"]:
+						video_range = Video.Range.HLG
+						video_codec = Video.Codec.HEVC
+					else:
+						video_range = Video.Range.SDR
+						video_codec = self.VIDEO_CODEC_MAP[media_format["mimeType"]]
+
+					for quality in media_format["qualities"]:
+						height = quality["highestVerticalResolution"]
+						for track in quality["audio"]["tracks"]:
+							if track["class"] not in ("main", "ot"):
+								continue
+
+							key = (video_codec, track["language"], height)
+							if key in seen_video:
+								continue
+							seen_video.add(key)
+
+							tracks.add(Video(
+								id_=f'{video_codec}-{track["language"]}-{height}',
+								codec=video_codec,
+								range_=video_range,
+								width=height // 9 * 16,
+								height=height,
+								url=track["uri"],
+								language=track["language"],
+								fps=50,
+							))
+
+			for subs in ptmd["captions"]:
+				if subs["format"] == "ebu-tt-d-basic-de":
+					key = (subs["language"], subs["class"])
+					if key in seen_subs:
+						continue
+					seen_subs.add(key)
+
+					tracks.add(Subtitle(
+						id_=f'subs-{subs["language"]}-{subs["class"]}',
+						codec=Subtitle.Codec.TimedTextMarkupLang,
+						language=subs["language"],
+						sdh=subs["class"] == "hoh",
+						url=subs["uri"]
+					))
 
 		return tracks
 
@@ -165,7 +212,7 @@ class ZDF(Service):
 			series_title = video["smartCollection"].get("title", "DUMMY")
 
 			# Ignore fake episode names like "Episode 123" or "Series Name (1/8)"
-			if re.match(fr"^(Folge \d+|{series_title} \(\d+/\d+\))$", name):
+			if _fake_episode_name_re(series_title).match(name):
 				name = None
 
 			return Series([Episode(
@@ -177,13 +224,6 @@ class ZDF(Service):
 			)])
 
 	def handle_series_page(self, slug):
-		extensions = {
-			"persistedQuery": {
-				"version": 1,
-				"sha256Hash": "9412a0f4ac55dc37d46975d461ec64bfd14380d815df843a1492348f77b5c99a"
-			}
-		}
-
 		variables = {
 			"seasonIndex": 0,
 			"episodesPageSize": 24,
@@ -197,11 +237,11 @@ class ZDF(Service):
 		}
 
 		r = self.session.get(self.config["endpoints"]["graphql"], params={
-			"extensions": json.dumps(extensions),
-			"variables": json.dumps(variables)
+			"extensions": self.SERIES_PAGE_EXTENSIONS,
+			"variables": json.dumps(variables, separators=(",", ":"))
 		}, headers={"content-type": "application/json"})
 
-		data = r.json()["data"]["smartCollectionByCanonical"]
+		data = json_loads(r.content)["data"]["smartCollectionByCanonical"]
 		if not data:
 			return
 
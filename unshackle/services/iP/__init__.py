@@ -1,29 +1,42 @@
 from __future__ import annotations
 
+import atexit
 import base64
 import hashlib
-import json
 import re
 import tempfile
 import warnings
 from collections.abc import Generator
 from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
 from pathlib import Path
 from typing import Any, Union
 
 import click
 from bs4 import XMLParsedAsHTMLWarning
 from click import Context
+from requests.adapters import HTTPAdapter
 from unshackle.core.manifests import DASH, HLS
 from unshackle.core.search_result import SearchResult
 from unshackle.core.service import Service
 from unshackle.core.titles import Episode, Movie, Movies, Series
 from unshackle.core.tracks import Audio, Chapters, Subtitle, Tracks, Video
 from unshackle.core.utils.collections import as_list
+from unshackle.core.utils.json import json_loads
 from unshackle.core.utils.sslciphers import SSLCiphers
 
 warnings.filterwarnings("ignore", category=XMLParsedAsHTMLWarning)
 
+REDUX_STATE_RE = re.compile(rb"window\.__IPLAYER_REDUX_STATE__\s*=\s*(.*?);\s*</script>")
+AUDIO_RE = re.compile(r"-audio_\w+=\d+")
+AUDIO_BITRATE_RE = re.compile(r"-audio_\w+=(\d+)")
+VIDEO_RE = re.compile(r"-video=\d+")
+VIDEO_BITRATE_RE = re.compile(r"-video=(\d+)")
+SERIES_RE = re.compile(r"Series (\d+).*?:|Season (\d+).*?:|(\d{4}/\d{2}): Episode \d+")
+NUMBER_RE = re.compile(r"(\d+)\.|Episode (\d+)")
+NAME_RE = re.compile(r"\d+\. (.+)")
+GENERIC_NAME_RE = re.compile(r"Series \d+: Episode \d+")
+
 
 class iP(Service):
     """
@@ -48,7 +61,9 @@ class iP(Service):
 
     ALIASES = ("bbciplayer", "bbc", "iplayer")
     GEOFENCE = ("gb",)
-    TITLE_RE = r"^(?:https?://(?:www\.)?bbc\.co\.uk/(?:iplayer/(?P<kind>episode|episodes)/|programmes/))?(?P<id>[a-z0-9]+)(?:/.*)?$"
+    TITLE_RE = re.compile(
+        r"^(?:https?://(?:www\.)?bbc\.co\.uk/(?:iplayer/(?P<kind>episode|episodes)/|programmes/))?(?P<id>[a-z0-9]+)(?:/.*)?$"
+    )
   
     @staticmethod
     @click.command(name="iP", short_help="https://www.bbc.co.uk/iplayer", help=__doc__)
@@ -65,6 +80,16 @@ class iP(Service):
 
         self.session.headers.update({"user-agent": "BBCiPlayer/5.17.2.32046"})
 
+        # episode metadata is fetched with up to 32 workers, give each of them a pooled connection
+        adapter = HTTPAdapter(
+            pool_connections=32,
+            pool_maxsize=32,
+            max_retries=self.session.adapters["https://"].max_retries,
+            pool_block=True,
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
         if self.range and self.range[0].name == "HLG":
             if not self.config.get("certificate"):
                 raise CertificateMissingError("HLG/H.265 tracks cannot be requested without a TLS certificate.")
@@ -72,11 +97,23 @@ class iP(Service):
             self.session.headers.update({"user-agent": self.config["user_agent"]})
             self.vcodec = "H.265"
 
+        if self.vcodec == "H.265":
+            # the secure mediators need a relaxed cipher set, mount it once so its pool is kept between probes
+            self.session.mount(
+                "https://",
+                SSLCiphers(
+                    pool_connections=32,
+                    pool_maxsize=32,
+                    max_retries=adapter.max_retries,
+                    pool_block=True,
+                ),
+            )
+
     def search(self) -> Generator[SearchResult, None, None]:
         r = self.session.get(self.config["endpoints"]["search"], params={"q": self.title})
         r.raise_for_status()
 
-        results = r.json().get("new_search", {}).get("results", [])
+        results = json_loads(r.content).get("new_search", {}).get("results", [])
         for result in results:
             programme_type = result.get("type", "unknown")
             category = result.get("labels", {}).get("category", "")
@@ -90,13 +127,11 @@ class iP(Service):
             )
 
     def get_titles(self) -> Union[Movies, Series]:
-        match = re.match(self.TITLE_RE, self.title)
+        match = self.TITLE_RE.match(self.title)
         if not match:
             raise ValueError("Could not parse ID from title - is the URL/ID format correct?")
 
-        groups = match.groupdict()
-        pid = groups.get("id")
-        kind = groups.get("kind")
+        pid, kind = match["id"], match["kind"]
 
         # Attempt to get brand/series data first
         data = self.get_data(pid, slice_id=None)
@@ -112,7 +147,7 @@ class iP(Service):
         if data.get("count", 0) < 2:
             r = self.session.get(self.config["endpoints"]["episodes"].format(pid=pid))
             r.raise_for_status()
-            episodes_data = r.json()
+            episodes_data = json_loads(r.content)
             if not episodes_data.get("episodes"):
                 raise MetadataError(f"Episode metadata not found for '{pid}'.")
 
@@ -131,14 +166,18 @@ class iP(Service):
             )
 
         # It's a full series
-        seasons = [self.get_data(pid, x["id"]) for x in data.get("slices") or [{"id": None}]]
-        episode_ids = [
-            episode.get("episode", {}).get("id")
-            for season in seasons
-            for episode in season.get("entities", {}).get("results", [])
-            if not episode.get("episode", {}).get("live")
-            and episode.get("episode", {}).get("id")
-        ]
+        slices = data.get("slices") or [{"id": None}]
+        if len(slices) > 1:
+            with ThreadPoolExecutor(max_workers=min(8, len(slices))) as executor:
+                seasons = list(executor.map(lambda x: self.get_data(pid, x["id"]), slices))
+        else:
+            seasons = [self.get_data(pid, slices[0]["id"])]
+        episode_ids = []
+        for season in seasons:
+            for entity in season.get("entities", {}).get("results", []):
+                episode = entity.get("episode") or {}
+                if not episode.get("live") and (episode_id := episode.get("id")):
+                    episode_ids.append(episode_id)
 
         episodes = self.get_episodes(episode_ids)
         return Series(episodes)
@@ -148,8 +187,9 @@ class iP(Service):
         if not versions:
             raise NoStreamsAvailableError("No available versions for this title were found.")
 
-        connections = [self.check_all_versions(version["pid"]) for version in versions]
-        connections = [c for c in connections if c]
+        with ThreadPoolExecutor(max_workers=min(8, len(versions))) as executor:
+            connections = executor.map(lambda version: self.check_all_versions(version["pid"]), versions)
+            connections = [c for c in connections if c]
         if not connections:
             if self.vcodec == "H.265":
                 raise NoStreamsAvailableError("Selection unavailable in UHD.")
@@ -170,7 +210,7 @@ class iP(Service):
         """Fetch all available versions for a programme ID."""
         r = self.session.get(url=self.config["endpoints"]["playlist"].format(pid=pid))
         r.raise_for_status()
-        playlist = r.json()
+        playlist = json_loads(r.content)
 
         versions = playlist.get("allAvailableVersions")
         if versions:
@@ -180,49 +220,41 @@ class iP(Service):
         self.log.debug("No versions in playlist API, falling back to webpage scrape.")
         r = self.session.get(self.config["base_url"].format(type="episode", pid=pid))
         r.raise_for_status()
-        match = re.search(r"window\.__IPLAYER_REDUX_STATE__\s*=\s*(.*?);\s*</script>", r.text)
+        # jump straight to the marker and anchor the pattern there instead of scanning the whole page
+        start = r.content.find(b"window.__IPLAYER_REDUX_STATE__")
+        match = REDUX_STATE_RE.match(r.content, start) if start != -1 else None
         if match:
-            redux_data = json.loads(match.group(1))
+            redux_data = json_loads(match.group(1))
             redux_versions = redux_data.get("versions")
             versions = redux_versions.values() if isinstance(redux_versions, dict) else redux_versions
+            if not versions:
+                return []
+
             # Filter out audio-described versions
             return [
-                {"pid": v.get("id")}
+                {"pid": vpid}
                 for v in versions
-                if v.get("kind") != "audio-described" and v.get("id")
+                if v.get("kind") != "audio-described" and (vpid := v.get("id"))
             ]
 
         return []
 
     def _select_best_media(self, connections: list[list[dict]]) -> list[dict]:
         """Selects the media group corresponding to the highest available video quality."""
-        heights = sorted(
-            {
-                int(c["height"])
-                for media_list in connections
-                for c in media_list
-                if c.get("height", "").isdigit()
-            },
-            reverse=True,
-        )
-
-        if not heights:
+        # single pass, a later group only wins with a strictly greater height so ties keep the first group
+        best_media_list, highest_height = None, -1
+        for media_list in connections:
+            for c in media_list:
+                height = c.get("height", "")
+                if height.isdigit() and int(height) > highest_height:
+                    best_media_list, highest_height = media_list, int(height)
+
+        if best_media_list is None:
             self.log.warning("No video streams with height information were found.")
             # Fallback: return the first available media group if any exist.
             return connections[0] if connections else None
 
-        highest_height = heights[0]
-        self.log.debug(f"Available resolutions (p): {heights}. Selecting highest: {highest_height}p.")
-
-        best_media_list = next(
-            (
-                media_list
-                for media_list in connections
-                if any(conn.get("height") == str(highest_height) for conn in media_list)
-            ),
-            None,  # Default to None if no matching group is found (should be impossible if heights is not empty)
-        )
-
+        self.log.debug(f"Selecting highest available resolution: {highest_height}p.")
         return best_media_list
 
     def _select_tracks(self, media: list[dict], lang: str):
@@ -267,17 +299,20 @@ class iP(Service):
             if video.codec == Video.Codec.HEVC:
                 video.range = Video.Range.HLG
 
-            if any(re.search(r"-audio_\w+=\d+", x) for x in as_list(video.url)):
+            # HLS tracks carry a single URL, so read it once rather than per regex
+            url = as_list(video.url)[0]
+            if AUDIO_RE.search(url):
                 # create audio stream from the video stream
-                audio_url = re.sub(r"-video=\d+", "", as_list(video.url)[0])
+                playlist = video.data["hls"]["playlist"]
+                audio_url = VIDEO_RE.sub("", url)
                 audio = Audio(
                     # use audio_url not video url, as to ignore video bitrate in ID
-                    id_=hashlib.md5(audio_url.encode()).hexdigest()[0:7],
+                    id_=hashlib.blake2b(audio_url.encode(), digest_size=4).hexdigest()[:7],
                     url=audio_url,
-                    codec=Audio.Codec.from_codecs(video.data["hls"]["playlist"].stream_info.codecs),
-                    language=video.data["hls"]["playlist"].media[0].language,
-                    bitrate=int(self.find(r"-audio_\w+=(\d+)", as_list(video.url)[0]) or 0),
-                    channels=video.data["hls"]["playlist"].media[0].channels,
+                    codec=Audio.Codec.from_codecs(playlist.stream_info.codecs),
+                    language=playlist.media[0].language,
+                    bitrate=int(m[1]) if (m := AUDIO_BITRATE_RE.search(url)) else 0,
+                    channels=playlist.media[0].channels,
                     descriptive=False,  # Not available
                     descriptor=Audio.Descriptor.HLS,
                     drm=video.drm,
@@ -287,15 +322,15 @@ class iP(Service):
                     # some video streams use the same audio, so natural dupes exist
                     tracks.add(audio)
                 # remove audio from the video stream
-                video.url = [re.sub(r"-audio_\w+=\d+", "", x) for x in as_list(video.url)][0]
-                video.codec = Video.Codec.from_codecs(video.data["hls"]["playlist"].stream_info.codecs)
-                video.bitrate = int(self.find(r"-video=(\d+)", as_list(video.url)[0]) or 0)
+                video.url = AUDIO_RE.sub("", url)
+                video.codec = Video.Codec.from_codecs(playlist.stream_info.codecs)
+                video.bitrate = int(m[1]) if (m := VIDEO_BITRATE_RE.search(video.url)) else 0
 
         for caption in [x for x in media if x["kind"] == "captions"]:
             connection = sorted(caption["connection"], key=lambda x: x["priority"])[0]
             tracks.add(
                 Subtitle(
-                    id_=hashlib.md5(connection["href"].encode()).hexdigest()[0:6],
+                    id_=hashlib.blake2b(connection["href"].encode(), digest_size=3).hexdigest(),
                     url=connection["href"],
                     codec=Subtitle.Codec.from_codecs("ttml"),
                     language=lang,
@@ -316,29 +351,31 @@ class iP(Service):
         }
         r = self.session.post(self.config["endpoints"]["metadata"], json=json_data)
         r.raise_for_status()
-        return r.json().get("data", {}).get("programme")
+        return json_loads(r.content).get("data", {}).get("programme")
+
+    @cached_property
+    def cert_path(self) -> str:
+        """Writes the TLS client certificate to disk once and removes it when the process exits."""
+        with tempfile.NamedTemporaryFile(mode="w+b", delete=False, suffix=".pem") as cert_file:
+            cert_file.write(base64.b64decode(self.config["certificate"]))
+
+        atexit.register(Path(cert_file.name).unlink, missing_ok=True)
+        return cert_file.name
 
     def check_all_versions(self, vpid: str) -> list:
         """Checks media availability for a given version PID, trying multiple mediators."""
         session = self.session
-        cert_path = None
         params = {}
 
         if self.vcodec == "H.265":
             if not self.config.get("certificate"):
                 raise CertificateMissingError("TLS certificate not configured.")
 
-            session.mount("https://", SSLCiphers())
             endpoint_template = self.config["endpoints"]["secure"]
             mediators = ["securegate.iplayer.bbc.co.uk", "ipsecure.stage.bbc.co.uk"]
             mediaset = "iptv-uhd"
 
-            cert_binary = base64.b64decode(self.config["certificate"])
-            with tempfile.NamedTemporaryFile(mode="w+b", delete=False, suffix=".pem") as cert_file:
-                cert_file.write(cert_binary)
-                cert_path = cert_file.name
-
-            params["cert"] = cert_path
+            params["cert"] = self.cert_path
         else:
             endpoint_template = self.config["endpoints"]["open"]
             mediators = ["open.live.bbc.co.uk", "open.stage.bbc.co.uk"]
@@ -353,7 +390,7 @@ class iP(Service):
             try:
                 r = session.get(url, **params)
                 r.raise_for_status()
-                availability = r.json()
+                availability = json_loads(r.content)
 
                 if availability.get("media"):
                     return availability["media"]
@@ -364,10 +401,6 @@ class iP(Service):
 
             except Exception as e:
                 self.log.debug(f"Failed to check mediator '{mediator}': {e}")
-            
-            finally:
-                if cert_path is not None:
-                    Path(cert_path).unlink(missing_ok=True)
 
         return None
 
@@ -375,35 +408,36 @@ class iP(Service):
         """Fetches and parses data for a single episode."""
         r = self.session.get(self.config["endpoints"]["episodes"].format(pid=pid))
         r.raise_for_status()
-        data = r.json()
+        data = json_loads(r.content)
 
         if not data.get("episodes"):
             return None
 
         episode_data = data["episodes"][0]
-        subtitle = episode_data.get("subtitle", "")
+        subtitle = episode_data.get("subtitle") or ""
         year = (episode_data.get("release_date_time", "") or "").split("-")[0]
 
-        series_match = next(re.finditer(r"Series (\d+).*?:|Season (\d+).*?:|(\d{4}/\d{2}): Episode \d+", subtitle), None)
+        # every SERIES_RE alternative needs a colon, and empty subtitles need no regex work at all
+        series_match = SERIES_RE.search(subtitle) if ":" in subtitle else None
         season_num = 0
         if series_match:
-            season_str = next(g for g in series_match.groups() if g is not None)
-            season_num = int(season_str.replace("/", ""))
+            # only one alternative can participate, and lastindex points straight at its group
+            season_num = int(series_match[series_match.lastindex].replace("/", ""))
         elif not data.get("slices"):  # Fallback for single-season shows
             season_num = 1
 
-        num_match = next(re.finditer(r"(\d+)\.|Episode (\d+)", subtitle), None)
+        num_match = NUMBER_RE.search(subtitle) if subtitle else None
         number = 0
         if num_match:
-            number = int(next(g for g in num_match.groups() if g is not None))
+            number = int(num_match[num_match.lastindex])
         else:
             number = episode_data.get("numeric_tleo_position", 0)
 
-        name_match = re.search(r"\d+\. (.+)", subtitle)
+        name_match = NAME_RE.search(subtitle) if subtitle else None
         name = ""
         if name_match:
             name = name_match.group(1)
-        elif not re.search(r"Series \d+: Episode \d+", subtitle):
+        elif subtitle and not GENERIC_NAME_RE.search(subtitle):
             name = subtitle
 
         return Episode(
@@ -419,17 +453,8 @@ class iP(Service):
 
     def get_episodes(self, episode_ids: list) -> list[Episode]:
         """Fetches multiple episodes concurrently."""
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            tasks = executor.map(self.fetch_episode, episode_ids)
-        return [task for task in tasks if task is not None]
-    
-    def find(self, pattern, string, group=None):
-        if group:
-            m = re.search(pattern, string)
-            if m:
-                return m.group(group)
-        else:
-            return next(iter(re.findall(pattern, string)), None)
+        with ThreadPoolExecutor(max_workers=min(32, len(episode_ids)) or 1) as executor:
+            return [episode for episode in executor.map(self.fetch_episode, episode_ids) if episode is not None]
 
 
 class iPlayerError(Exception):
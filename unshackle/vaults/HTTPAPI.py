@@ -1,11 +1,12 @@
-import json
 from typing import Iterator, Optional, Union
 from uuid import UUID
 from enum import Enum
 
 from requests import Session
+from requests.adapters import HTTPAdapter, Retry
 
 from unshackle.core import __version__
+from unshackle.core.utils.json import json_loads
 from unshackle.core.vault import Vault
 
 
@@ -15,6 +16,10 @@ class InsertResult(Enum):
     ALREADY_EXISTS = 2
 
 
+class MethodNotSupported(ValueError):
+    """The vault API does not implement the requested method."""
+
+
 class HTTPAPI(Vault):
     """Key Vault using a structured HTTP API with JSON payloads and token authentication."""
 
@@ -24,8 +29,20 @@ class HTTPAPI(Vault):
         self.password = password  # This is the API token
         self.current_title = None
         self.session = Session()
-        self.session.headers.update({"User-Agent": f"Devine v{__version__}"})
+        self.session.headers.update({"User-Agent": f"Devine v{__version__}", "Accept": "application/json"})
+        # a wider keep-alive pool plus connect retries; urllib3 never retries a POST on status by default
+        adapter = HTTPAdapter(
+            pool_connections=32,
+            pool_maxsize=32,
+            max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=(502, 503, 504)),
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
         self.api_session_id = None
+        # whether the server understands the batch InsertKeys method, None until it has been tried
+        self.supports_insert_keys: Optional[bool] = None
+        # every key the server has returned for the current title, keyed by (service, title) then kid
+        self.key_cache: dict[tuple[str, Optional[str]], dict[str, str]] = {}
 
     def request(self, method: str, params: dict = None) -> dict:
         """Make a request to the HTTPAPI vault."""
@@ -43,16 +60,20 @@ class HTTPAPI(Vault):
         if r.status_code == 404:
             return {"status": "not_found"}
 
+        if r.status_code == 405:
+            raise MethodNotSupported(f"API does not support the {method} method")
+
         if not r.ok:
             raise ValueError(f"API returned HTTP Error {r.status_code}: {r.reason.title()}")
 
         try:
-            res = r.json()
-        except json.JSONDecodeError:
-            if r.status_code == 404:
-                return {"status": "not_found"}
+            res = json_loads(r.content)
+        except ValueError:  # JSONDecodeError from either parser, or undecodable bytes
             raise ValueError(f"API returned an invalid response: {r.text}")
 
+        if res.get("status_code") == 405 or "method_not_found" in (res.get("status"), res.get("message")):
+            raise MethodNotSupported(f"API does not support the {method} method")
+
         if res.get("status_code") != 200:
             raise ValueError(f"API returned an error: {res['status_code']} - {res['message']}")
 
@@ -65,22 +86,26 @@ class HTTPAPI(Vault):
         if isinstance(kid, UUID):
             kid = kid.hex
 
+        service = service.lower()
+        title = self.current_title
+        cached = self.key_cache.setdefault((service, title), {})
+        if kid in cached:
+            return cached[kid]
+
         try:
-            title = getattr(self, "current_title", None)
             response = self.request(
                 "GetKey",
                 {
                     "kid": kid,
-                    "service": service.lower(),
+                    "service": service,
                     "title": title,
                 },
             )
             if response.get("status") == "not_found":
                 return None
-            keys = response.get("keys", [])
-            for key_entry in keys:
-                if key_entry["kid"] == kid:
-                    return key_entry["key"]
+            # the server may answer with more keys than the one asked for, keep them all for the next lookups
+            cached.update((key_entry["kid"], key_entry["key"]) for key_entry in response.get("keys", []))
+            return cached.get(kid)
         except Exception as e:
             print(f"Failed to get key ({e.__class__.__name__}: {e})")
             return None
@@ -109,7 +134,7 @@ class HTTPAPI(Vault):
         if isinstance(kid, UUID):
             kid = kid.hex
 
-        title = getattr(self, "current_title", None)
+        title = self.current_title
 
         try:
             response = self.request(
@@ -128,17 +153,25 @@ class HTTPAPI(Vault):
             return False
 
     def add_keys(self, service: str, kid_keys: dict[Union[UUID, str], str]) -> int:
-        for kid, key in kid_keys.items():
-            if not key or key.count("0") == len(key):
-                raise ValueError("You cannot add a NULL Content Key to a Vault.")
+        if any(not key or key.count("0") == len(key) for key in kid_keys.values()):
+            raise ValueError("You cannot add a NULL Content Key to a Vault.")
 
         processed_kid_keys = {
             str(kid).replace("-", "") if isinstance(kid, UUID) else kid: key for kid, key in kid_keys.items()
         }
 
-        inserted_count = 0
-        title = getattr(self, "current_title", None)
+        if not processed_kid_keys:
+            return 0
+
+        service = service.lower()
+        title = self.current_title
+
+        if self.supports_insert_keys is not False:
+            inserted_count = self._insert_keys(service, processed_kid_keys, title)
+            if inserted_count is not None:
+                return inserted_count
 
+        inserted_count = 0
         for kid, key in processed_kid_keys.items():
             try:
                 response = self.request(
@@ -146,7 +179,7 @@ class HTTPAPI(Vault):
                     {
                         "kid": kid,
                         "key": key,
-                        "service": service.lower(),
+                        "service": service,
                         "title": title,
                     },
                 )
@@ -159,6 +192,42 @@ class HTTPAPI(Vault):
 
         return inserted_count
 
+    def _insert_keys(self, service: str, kid_keys: dict[str, str], title: Optional[str]) -> Optional[int]:
+        """
+        Insert all keys with a single InsertKeys call.
+        Returns None when the batch call could not be used, so the caller can fall back to InsertKey.
+        """
+        try:
+            response = self.request(
+                "InsertKeys",
+                {
+                    "kids": [{"kid": kid, "key": key} for kid, key in kid_keys.items()],
+                    "service": service,
+                    "title": title,
+                },
+            )
+        except MethodNotSupported:
+            self.supports_insert_keys = False
+            return None
+        except Exception as e:
+            print(f"Failed to insert keys ({e.__class__.__name__}: {e})")
+            return 0
+
+        if isinstance(response, dict) and response.get("status") == "method_not_found":
+            self.supports_insert_keys = False
+            return None
+
+        # only a reply carrying an insert count or per-item results proves the batch method worked
+        if isinstance(response, dict) and isinstance(response.get("results"), list):
+            self.supports_insert_keys = True
+            return sum(1 for result in response["results"] if isinstance(result, dict) and result.get("inserted"))
+        if isinstance(response, dict) and type(response.get("inserted")) is int:
+            self.supports_insert_keys = True
+            return response["inserted"]
+
+        # an unrecognised reply is not proof the method is missing, use InsertKey for this call only
+        return None
+
     def get_services(self) -> Iterator[str]:
         """Get available services - this may need to be implemented based on your API."""
         try:
@@ -174,6 +243,8 @@ class HTTPAPI(Vault):
         Set a title to be used for the next key insertions.
         This is optional and will be sent with add_key requests if available.
         """
+        if title != self.current_title:
+            self.key_cache.clear()
         self.current_title = title
 
     def insert_key_with_result(
@@ -190,7 +261,7 @@ class HTTPAPI(Vault):
             kid = kid.hex
 
         if title is None:
-            title = getattr(self, "current_title", None)
+            title = self.current_title
 
         try:
             response = self.request(